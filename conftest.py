@@ -0,0 +1,12 @@
+from typing import Iterator
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fake_users_cache_redis() -> Iterator[None]:
+    """Подменяет Redis кэша пользователей, чтобы каждое сохранение пользователя в тестах не обращалось к Redis"""
+    with patch("users.cache.get_redis_client", return_value=fakeredis.FakeRedis()):
+        yield
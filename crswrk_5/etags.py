@@ -0,0 +1,47 @@
+import hashlib
+from typing import Any
+
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+class PreconditionFailed(APIException):
+    """Ошибка условного запроса: объект изменился после того, как клиент получил его ETag"""
+
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "Объект был изменен, получите его заново"
+    default_code = "precondition_failed"
+
+
+def make_etag(*parts: Any) -> str:
+    """Возвращает сильный ETag по версиям объектов и параметрам представления"""
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def get_query_key(request: Request) -> list[tuple[str, list[str]]]:
+    """Возвращает параметры запроса, от которых зависит представление, в каноническом порядке"""
+    return sorted(request.query_params.lists())
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Проверяет, что версия клиента из If-None-Match совпадает с текущей"""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    etags = {value.removeprefix("W/") for value in parse_etags(header)}
+    return "*" in etags or etag in etags
+
+
+def not_modified(etag: str) -> Response:
+    """Возвращает ответ 304 без тела"""
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def check_if_match(request: Request, etag: str) -> None:
+    """Отклоняет изменение объекта с кодом 412, если версия из If-Match устарела"""
+    header = request.headers.get("If-Match")
+    if header and not {"*", etag} & set(parse_etags(header)):
+        raise PreconditionFailed()
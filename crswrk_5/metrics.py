@@ -0,0 +1,90 @@
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+
+@dataclass
+class QueryRecord:
+    """SQL-запрос, выполненный при обработке HTTP-запроса, и его длительность в секундах"""
+
+    sql: str
+    params: Any
+    duration: float
+
+
+@dataclass
+class RequestMetrics:
+    """Счетчики одного HTTP-запроса: SQL-запросы и время этапов обработки в секундах"""
+
+    queries: list[QueryRecord] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=lambda: defaultdict(float))
+
+    @property
+    def sql_time(self) -> float:
+        """Возвращает суммарное время SQL-запросов"""
+        return sum(query.duration for query in self.queries)
+
+    def get_duplicates(self) -> dict[str, int]:
+        """Возвращает запросы, выполненные с одинаковыми параметрами больше одного раза, и число их повторов"""
+        counts = Counter((query.sql, repr(query.params)) for query in self.queries)
+        duplicates: dict[str, int] = defaultdict(int)
+        for (sql, _), count in counts.items():
+            if count > 1:
+                duplicates[sql] += count
+        return dict(duplicates)
+
+    def get_n_plus_one(self, threshold: int) -> dict[str, int]:
+        """Возвращает шаблоны запросов, повторенные с разными параметрами не меньше threshold раз, признак N+1"""
+        params: dict[str, set[str]] = defaultdict(set)
+        for query in self.queries:
+            params[query.sql].add(repr(query.params))
+        return {sql: len(values) for sql, values in params.items() if len(values) >= threshold}
+
+
+_current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def get_current_metrics() -> Optional[RequestMetrics]:
+    """Возвращает счетчики текущего HTTP-запроса, если их собирает RequestMetricsMiddleware"""
+    return _current_metrics.get()
+
+
+@contextmanager
+def collect_metrics(metrics: RequestMetrics) -> Iterator[RequestMetrics]:
+    """Делает счетчики текущими для кода внутри блока"""
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Добавляет время выполнения блока к этапу name текущего запроса, без сбора счетчиков ничего не делает"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - started
+
+
+def record_query(metrics: RequestMetrics) -> Callable[..., Any]:
+    """Возвращает обертку connection.execute_wrapper, которая записывает запросы и их длительность в metrics"""
+
+    def wrapper(execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]) -> Any:
+        """Выполняет запрос и записывает его длительность"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.queries.append(QueryRecord(sql, params, time.perf_counter() - started))
+
+    return wrapper
@@ -0,0 +1,83 @@
+import logging
+import time
+from contextlib import ExitStack
+from typing import Any, Callable
+
+import orjson
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from crswrk_5.metrics import RequestMetrics, collect_metrics, get_current_metrics, record_query
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL-запросы и время этапов обработки запроса, отдает их в Server-Timing и в журнал"""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        # Без REQUEST_METRICS_ENABLED Django исключает middleware из цепочки, и она ничего не стоит
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Обрабатывает запрос со сбором счетчиков и добавляет их к ответу"""
+        metrics = RequestMetrics()
+        started = time.perf_counter()
+        with collect_metrics(metrics), ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query(metrics)))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        response["Server-Timing"] = self.get_server_timing(metrics, total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def process_template_response(self, request: HttpRequest, response: Any) -> Any:
+        """Замеряет рендеринг ответов DRF: он выполняется сразу после этого хука"""
+        metrics = get_current_metrics()
+        if metrics is None:
+            return response
+        started = time.perf_counter()
+
+        def finish_render(rendered: HttpResponse) -> None:
+            """Записывает время рендеринга"""
+            metrics.timings["render"] += time.perf_counter() - started
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    @staticmethod
+    def get_server_timing(metrics: RequestMetrics, total: float) -> str:
+        """Возвращает значение заголовка Server-Timing с длительностями в миллисекундах"""
+        entries = [f'db;dur={metrics.sql_time * 1000:.2f};desc="{len(metrics.queries)} queries"']
+        entries.extend(f"{name};dur={duration * 1000:.2f}" for name, duration in metrics.timings.items())
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+    def log(self, request: HttpRequest, response: HttpResponse, metrics: RequestMetrics, total: float) -> None:
+        """Пишет строку с метриками запроса в JSON, для медленных запросов — предупреждение с шаблонами их SQL"""
+        duplicates = metrics.get_duplicates()
+        n_plus_one = metrics.get_n_plus_one(settings.REQUEST_METRICS_N_PLUS_ONE_THRESHOLD)
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": len(metrics.queries),
+            "sql_ms": round(metrics.sql_time * 1000, 2),
+            **{f"{name}_ms": round(duration * 1000, 2) for name, duration in metrics.timings.items()},
+            "total_ms": round(total * 1000, 2),
+            "duplicate_queries": duplicates,
+            "n_plus_one": n_plus_one,
+        }
+        logger.info(orjson.dumps(record).decode())
+        if duplicates or n_plus_one:
+            patterns = "\n".join(f"{count}x: {sql}" for sql, count in {**duplicates, **n_plus_one}.items())
+            logger.warning(f"Повторяющиеся запросы (дубли или N+1) в {request.method} {request.path}:\n{patterns}")
+        if total * 1000 >= settings.REQUEST_METRICS_SLOW_MS:
+            # Параметры не пишутся: в них бывают хеши паролей, email и chat_id пользователей
+            sql = "\n".join(f"{query.duration * 1000:.2f} ms: {query.sql}" for query in metrics.queries)
+            logger.warning(f"Медленный запрос {request.method} {request.path}: {total * 1000:.2f} мс\n{sql}")
@@ -0,0 +1,111 @@
+import json
+from base64 import b64decode, b64encode
+from typing import Any, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import BooleanField, Model, QuerySet
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+
+
+def get_estimated_count(queryset: QuerySet) -> int:
+    """Возвращает число строк выборки по оценке планировщика Postgres, без COUNT(*)"""
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Курсорная пагинация по составному ключу: страница выбирается сравнением строк, без OFFSET и COUNT(*)"""
+
+    model: type[Model]
+    ordering: Any = ("id",)
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Некорректный курсор"
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: Optional[APIView] = None) -> list[Model]:
+        """Возвращает страницу, следующую за позицией курсора в порядке ordering"""
+        self.start_page(request)
+        return self.finish_page(list(self.filter_after_position(queryset)[: self.page_size + 1]))
+
+    def start_page(self, request: Request) -> None:
+        """Читает из запроса размер страницы и позицию курсора"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        self.position, self.is_reverse = self.cursor if self.cursor is not None else (None, False)
+
+    def filter_after_position(self, queryset: QuerySet) -> QuerySet:
+        """Упорядочивает набор по ключу в направлении курсора и отсекает строки до позиции"""
+        order = [f"-{field}" for field in self.ordering] if self.is_reverse else list(self.ordering)
+        queryset = queryset.order_by(*order)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_position_filter(queryset.model, self.position))
+        return queryset
+
+    def finish_page(self, results: list[Any]) -> list[Any]:
+        """Обрезает выборку из page_size + 1 строк до страницы и определяет наличие соседних страниц"""
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if self.is_reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        return self.page
+
+    def get_position_filter(self, model: type[Model], position: list[Any]) -> RawSQL:
+        """Возвращает условие (поля ключа) > позиции, которое Postgres выполняет одним диапазоном индекса"""
+        quote = connection.ops.quote_name
+        columns = ", ".join(
+            f"{quote(model._meta.db_table)}.{quote(model._meta.get_field(field).column)}" for field in self.ordering
+        )
+        placeholders = ", ".join(["%s"] * len(position))
+        operator = "<" if self.is_reverse else ">"
+        return RawSQL(f"({columns}) {operator} ({placeholders})", position, output_field=BooleanField())
+
+    def get_next_link(self) -> Optional[str]:
+        """Возвращает ссылку на следующую страницу"""
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor((self.get_position(self.page[-1]), False))
+
+    def get_previous_link(self) -> Optional[str]:
+        """Возвращает ссылку на предыдущую страницу"""
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor((self.get_position(self.page[0]), True))
+
+    def get_position(self, instance: Any) -> list[Any]:
+        """Возвращает значения полей ключа для объекта или его сериализованного представления"""
+        if isinstance(instance, dict):
+            return [instance[field] for field in self.ordering]
+        return [getattr(instance, field) for field in self.ordering]
+
+    def encode_cursor(self, cursor: tuple[list[Any], bool]) -> str:  # type: ignore[override]
+        """Кодирует позицию и направление в непрозрачный курсор и возвращает ссылку с ним"""
+        position, is_reverse = cursor
+        payload = json.dumps([[str(value) for value in position], int(is_reverse)])
+        token = b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request: Request) -> Optional[tuple[list[Any], bool]]:  # type: ignore[override]
+        """Разбирает курсор из запроса, для пустого курсора возвращает первую страницу"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            raw_position, is_reverse = json.loads(b64decode(token.encode(), validate=True).decode())
+            position = [
+                self.model._meta.get_field(field).to_python(value) for field, value in zip(self.ordering, raw_position)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(is_reverse)
@@ -0,0 +1,21 @@
+from typing import IO, Any, Optional
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from crswrk_5.renderers import ORJSONRenderer
+
+
+class ORJSONParser(BaseParser):
+    """JSON-парсер на orjson"""
+
+    media_type = "application/json"
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream: IO[bytes], media_type: Optional[str] = None, parser_context: Optional[dict] = None) -> Any:
+        """Разбирает тело запроса в JSON"""
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f"JSON parse error - {e}")
@@ -0,0 +1,43 @@
+from typing import Any, Optional
+
+import orjson
+from django.utils.http import parse_header_parameters
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Даты в UTC выводятся с суффиксом Z, как у стандартного JSON-рендерера DRF
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_encoder = JSONEncoder()
+
+
+def orjson_dumps(data: Any, option: int = 0) -> bytes:
+    """Сериализует данные в JSON через orjson, типы вне orjson (ленивые строки, Decimal и т.п.) переводит как DRF"""
+    return orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS | option)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON-рендерер на orjson"""
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(
+        self, data: Any, accepted_media_type: Optional[str] = None, renderer_context: Optional[dict] = None
+    ) -> bytes:
+        """Сериализует ответ в JSON, при запросе с indent выводит его с отступами"""
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return orjson_dumps(data, orjson.OPT_INDENT_2 if indent else 0)
+
+    def get_indent(self, accepted_media_type: Optional[str], renderer_context: dict) -> bool:
+        """Проверяет, запрошен ли вывод с отступами параметром indent в заголовке Accept или в контексте"""
+        if accepted_media_type:
+            _, params = parse_header_parameters(accepted_media_type)
+            try:
+                return int(params["indent"]) > 0
+            except (KeyError, ValueError):
+                pass
+        return bool(renderer_context.get("indent"))
@@ -0,0 +1,148 @@
+from functools import lru_cache
+from typing import Any, Iterable, Optional, Sequence
+
+from django.db.models import Model, QuerySet
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import Field, FileField
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.request import Request
+from rest_framework.serializers import ModelSerializer
+
+from crswrk_5.metrics import timed
+
+FIELDS_QUERY_PARAM = "fields"
+EXCLUDE_QUERY_PARAM = "exclude"
+EXPAND_QUERY_PARAM = "expand"
+
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(FIELDS_QUERY_PARAM, str, description="Поля ответа через запятую"),
+    OpenApiParameter(EXCLUDE_QUERY_PARAM, str, description="Поля, исключаемые из ответа, через запятую"),
+]
+EXPAND_PARAMETER = OpenApiParameter(
+    EXPAND_QUERY_PARAM, str, description="Связи, разворачиваемые во вложенные объекты, через запятую"
+)
+
+
+@lru_cache(maxsize=None)
+def get_readable_fields(serializer_class: type[ModelSerializer]) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """Возвращает выводимые поля сериализатора и среди них файловые поля"""
+    fields = {name: field for name, field in serializer_class().fields.items() if not field.write_only}
+    file_fields = tuple(name for name, field in fields.items() if isinstance(field, FileField))
+    return tuple(fields), file_fields
+
+
+def get_sparse_fields(request: Optional[Request], fields: Sequence[str]) -> tuple[str, ...]:
+    """Оставляет из полей те, что запрошены параметрами fields и exclude, на неизвестные поля отвечает 400"""
+    params = getattr(request, "query_params", None)
+    if not params:
+        return tuple(fields)
+    requested = _split_param(params.get(FIELDS_QUERY_PARAM))
+    excluded = _split_param(params.get(EXCLUDE_QUERY_PARAM))
+    unknown = sorted((requested | excluded) - set(fields))
+    if unknown:
+        raise ValidationError({FIELDS_QUERY_PARAM: [f"Неизвестные поля: {', '.join(unknown)}"]})
+    return tuple(name for name in fields if (not requested or name in requested) and name not in excluded)
+
+
+def get_expand_fields(request: Optional[Request], expandable: Sequence[str]) -> tuple[str, ...]:
+    """Возвращает связи, запрошенные параметром expand при чтении, на неизвестные связи отвечает 400"""
+    if request is None or request.method not in SAFE_METHODS:
+        return ()
+    requested = _split_param(request.query_params.get(EXPAND_QUERY_PARAM))
+    unknown = sorted(requested - set(expandable))
+    if unknown:
+        raise ValidationError({EXPAND_QUERY_PARAM: [f"Неизвестные связи: {', '.join(unknown)}"]})
+    return tuple(name for name in expandable if name in requested)
+
+
+def _split_param(value: Optional[str]) -> set[str]:
+    """Разбирает список полей через запятую"""
+    return {name.strip() for name in (value or "").split(",") if name.strip()}
+
+
+def get_only_fields(serializer: ModelSerializer) -> list[str]:
+    """Возвращает колонки модели, нужные для вывода полей сериализатора, для передачи в .only()"""
+    model: type[Model] = serializer.Meta.model
+    columns = {field.name for field in model._meta.concrete_fields}
+    sources = [field.source for field in serializer.fields.values() if not field.write_only]
+    return [model._meta.pk.name, *(source for source in sources if source in columns)]  # type: ignore[union-attr]
+
+
+class SparseFieldsMixin:
+    """Оставляет в выводе ModelSerializer только поля, запрошенные параметрами fields и exclude"""
+
+    context: dict[str, Any]
+
+    def get_fields(self) -> dict[str, Field]:
+        """Отбрасывает незапрошенные поля при чтении, при записи набор полей не меняется"""
+        fields: dict[str, Field] = super().get_fields()  # type: ignore[misc]
+        request = self.context.get("request")
+        # Развернутые через expand вложенные объекты выводятся целиком
+        if request is None or request.method not in SAFE_METHODS or self.context.get("nested"):
+            return fields
+        readable = [name for name, field in fields.items() if not field.write_only]
+        keep = set(get_sparse_fields(request, readable))
+        return {name: field for name, field in fields.items() if field.write_only or name in keep}
+
+    @property
+    def data(self) -> Any:
+        """Отдает представление и учитывает время сериализации в метриках запроса"""
+        if self.context.get("nested"):
+            return super().data  # type: ignore[misc]
+        with timed("serialize"):
+            return super().data  # type: ignore[misc]
+
+
+class PrefetchedPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """Связь по первичному ключу, которая при массовых операциях берет объекты из заранее загруженных одним запросом"""
+
+    def to_internal_value(self, data: Any) -> Any:
+        """Ищет объект в context["prefetched"][имя поля], без предзагрузки — запросом к базе"""
+        prefetched = self.context.get("prefetched", {}).get(self.field_name)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return prefetched[int(data)]
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+
+
+class ValuesSerializer:
+    """Быстрый сериализатор для чтения: отдает строки .values() в формате ModelSerializer без экземпляров модели"""
+
+    def __init__(self, serializer_class: type[ModelSerializer], context: Optional[dict[str, Any]] = None) -> None:
+        self.model: type[Model] = serializer_class.Meta.model
+        self.request = (context or {}).get("request")
+        fields, file_fields = get_readable_fields(serializer_class)
+        self.fields = get_sparse_fields(self.request, fields)
+        self.file_fields = tuple(name for name in file_fields if name in self.fields)
+
+    def values(self, queryset: QuerySet, *required: str) -> QuerySet:
+        """Ограничивает выборку запрошенными полями и полями required, нужными для пагинации и проверки прав"""
+        return queryset.values(*dict.fromkeys((*self.fields, *required)))
+
+    def to_representation(self, rows: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Приводит строки к представлению ModelSerializer: файловые поля заменяются на ссылки"""
+        data = self.trim(rows)
+        with timed("serialize"):
+            for name in self.file_fields:
+                storage = self.model._meta.get_field(name).storage  # type: ignore[union-attr]
+                for row in data:
+                    row[name] = self.get_file_url(storage.url(row[name])) if row[name] else None
+        return data
+
+    def trim(self, rows: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Оставляет в строках только запрошенные поля, не изменяя сами строки"""
+        rows = list(rows)
+        with timed("serialize"):
+            return [{name: row[name] for name in self.fields} for row in rows]
+
+    def get_file_url(self, url: str) -> str:
+        """Возвращает абсолютную ссылку на файл, если известен запрос"""
+        return self.request.build_absolute_uri(url) if self.request is not None else url
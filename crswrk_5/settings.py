@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "crswrk_5.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -107,12 +108,21 @@ AUTH_USER_MODEL = "users.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": [
+        "crswrk_5.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "crswrk_5.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 SIMPLE_JWT = {
@@ -124,6 +134,12 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT") or 1)
+
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT") or 2)
+
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 
 CELERY_TIMEZONE = "Europe/Moscow"
@@ -135,8 +151,79 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_BEAT_SCHEDULE = {
     "block_inactive_user": {
         "task": "habits.tasks.send_habits_reminders",
-        "schedule": 60.0,
+        "schedule": float(os.getenv("REMINDERS_TICK_INTERVAL") or 60),
+    },
+    "drain_reminder_outbox": {
+        "task": "habits.tasks.drain_reminder_outbox",
+        "schedule": 30.0,
     },
+    "load_reminder_schedule": {
+        "task": "habits.tasks.load_reminder_schedule",
+        "schedule": 60.0 * 60,
+    },
+    "purge_habit_tombstones": {
+        "task": "habits.tasks.purge_habit_tombstones",
+        "schedule": 24 * 60.0 * 60,
+    },
+}
+
+REMINDERS_QUEUE = os.getenv("REMINDERS_QUEUE") or "reminders"
+
+REMINDERS_CHUNK_SIZE = int(os.getenv("REMINDERS_CHUNK_SIZE") or 200)
+
+REMINDERS_LOOKAHEAD_MINUTES = int(os.getenv("REMINDERS_LOOKAHEAD_MINUTES") or 0)
+
+REMINDERS_MAX_CATCHUP_MINUTES = int(
+    os.getenv("REMINDERS_MAX_CATCHUP_MINUTES") or max(15, 3 * REMINDERS_LOOKAHEAD_MINUTES)
+)
+
+REMINDERS_SPREAD_SECONDS = int(os.getenv("REMINDERS_SPREAD_SECONDS") or 60)
+
+REMINDERS_SCHEDULE_BACKEND = os.getenv("REMINDERS_SCHEDULE_BACKEND") or "db"
+
+REMINDERS_SCHEDULE_HORIZON_HOURS = int(os.getenv("REMINDERS_SCHEDULE_HORIZON_HOURS") or 24)
+
+CELERY_TASK_ROUTES = {
+    "habits.tasks.drain_reminder_outbox": {"queue": REMINDERS_QUEUE},
+    "habits.tasks.load_reminder_schedule": {"queue": REMINDERS_QUEUE},
+}
+
+HABITS_FEED_CACHE_ENABLED = (os.getenv("HABITS_FEED_CACHE_ENABLED") or "True") == "True"
+
+HABITS_FEED_CACHE_TTL = int(os.getenv("HABITS_FEED_CACHE_TTL") or 300)
+
+HABITS_PUBLIC_FEED_ENABLED = (os.getenv("HABITS_PUBLIC_FEED_ENABLED") or "True") == "True"
+
+HABITS_SYNC_PAGE_SIZE = int(os.getenv("HABITS_SYNC_PAGE_SIZE") or 500)
+
+HABITS_SYNC_LAG_SECONDS = int(os.getenv("HABITS_SYNC_LAG_SECONDS") or 5)
+
+HABITS_SYNC_TOMBSTONE_DAYS = int(os.getenv("HABITS_SYNC_TOMBSTONE_DAYS") or 30)
+
+HABITS_BULK_MAX_ITEMS = int(os.getenv("HABITS_BULK_MAX_ITEMS") or 100)
+
+USERS_AUTH_CACHE_ENABLED = (os.getenv("USERS_AUTH_CACHE_ENABLED") or "True") == "True"
+
+USERS_AUTH_CACHE_SIZE = int(os.getenv("USERS_AUTH_CACHE_SIZE") or 1024)
+
+USERS_AUTH_CACHE_TTL = int(os.getenv("USERS_AUTH_CACHE_TTL") or 10)
+
+USERS_AUTH_CACHE_REDIS_TTL = int(os.getenv("USERS_AUTH_CACHE_REDIS_TTL") or 300)
+
+REQUEST_METRICS_ENABLED = (os.getenv("REQUEST_METRICS_ENABLED") or "False") == "True"
+
+REQUEST_METRICS_SLOW_MS = int(os.getenv("REQUEST_METRICS_SLOW_MS") or 500)
+
+REQUEST_METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv("REQUEST_METRICS_N_PLUS_ONE_THRESHOLD") or 5)
+
+# Без настройки строки метрик уровня INFO отбрасываются: по умолчанию Python выводит только предупреждения
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": (
+        {"crswrk_5.middleware": {"handlers": ["console"], "level": "INFO"}} if REQUEST_METRICS_ENABLED else {}
+    ),
 }
 
 CORS_ALLOWED_ORIGINS = os.getenv(
@@ -149,8 +236,30 @@ CSRF_TRUSTED_ORIGINS = os.getenv(
     ""
 ).split(",")
 
-TELEGRAM_URL = "https://api.telegram.org/bot"
+TELEGRAM_URL = os.getenv("TELEGRAM_URL") or "https://api.telegram.org/bot"
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT") or 10)
+
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv("TELEGRAM_SEND_CONCURRENCY") or 16)
+
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE") or 30)
+
+TELEGRAM_GLOBAL_BURST = int(os.getenv("TELEGRAM_GLOBAL_BURST") or 30)
+
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE") or 1)
+
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST") or 1)
+
+TELEGRAM_RATE_LIMIT_MAX_WAIT = float(os.getenv("TELEGRAM_RATE_LIMIT_MAX_WAIT") or 5)
+
+REMINDERS_MAX_RETRIES = int(os.getenv("REMINDERS_MAX_RETRIES") or 5)
+
+REMINDERS_RETRY_BACKOFF = float(os.getenv("REMINDERS_RETRY_BACKOFF") or 30)
+
+REMINDERS_RETRY_BACKOFF_MAX = float(os.getenv("REMINDERS_RETRY_BACKOFF_MAX") or 3600)
+
+REMINDERS_OUTBOX_LEASE_SECONDS = int(os.getenv("REMINDERS_OUTBOX_LEASE_SECONDS") or 300)
+
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
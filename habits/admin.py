@@ -1,9 +1,15 @@
 from django.contrib import admin
 
-from habits.models import Habit
+from habits.models import Habit, ReminderOutbox
 
 
 @admin.register(Habit)
 class HabitAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "action", "periodicity")
     list_filter = ("is_public",)
+
+
+@admin.register(ReminderOutbox)
+class ReminderOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "chat_id", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class HabitsConfig(AppConfig):
     name = "habits"
+
+    def ready(self) -> None:
+        """Подключает обработчики сигналов привычек"""
+        import habits.signals  # noqa: F401
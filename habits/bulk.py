@@ -0,0 +1,72 @@
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from habits.models import Habit
+from habits.serializers import get_habit_id
+from habits.signals import sync_saved_habits
+from users.models import User
+
+
+def check_batch(data: Any) -> list[Any]:
+    """Проверяет, что пачка — список не длиннее HABITS_BULK_MAX_ITEMS, до загрузки связанных привычек"""
+    if not isinstance(data, list) or not data:
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ["Ожидался непустой список"]})
+    if len(data) > settings.HABITS_BULK_MAX_ITEMS:
+        message = f"Не больше {settings.HABITS_BULK_MAX_ITEMS} привычек за запрос"
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [message]})
+    return data
+
+
+def get_habit_ids(values: Iterable[Any]) -> set[int]:
+    """Собирает числовые id привычек, некорректные значения отклонит сериализатор"""
+    return {habit_id for habit_id in map(get_habit_id, values) if habit_id is not None}
+
+
+def get_prefetched(user: User, items: list[Any], habits: Iterable[Habit] = ()) -> dict[str, dict[int, Any]]:
+    """Загружает одним запросом все связанные привычки пачки, включая текущие связи изменяемых привычек"""
+    related_ids = get_habit_ids(item.get("related_habit") for item in items if isinstance(item, dict))
+    related_ids |= {habit.related_habit_id for habit in habits if habit.related_habit_id is not None}
+    return {"user": {user.pk: user}, "related_habit": Habit.objects.in_bulk(related_ids) if related_ids else {}}
+
+
+@transaction.atomic
+def bulk_create_habits(items: list[dict[str, Any]]) -> list[Habit]:
+    """Создает пачку проверенных привычек одним запросом"""
+    habits = Habit.objects.bulk_create(Habit(**attrs) for attrs in items)
+    sync_saved_habits(habits)
+    return habits
+
+
+@transaction.atomic
+def bulk_update_habits(
+    habits: dict[int, Habit], data: list[dict[str, Any]], items: list[dict[str, Any]]
+) -> list[Habit]:
+    """Изменяет пачку привычек одним запросом, обновляя только переданные поля"""
+    updated, fields = [], set()
+    for raw, attrs in zip(data, items):
+        habit = habits[get_habit_id(raw)]  # type: ignore[index]
+        for name, value in attrs.items():
+            setattr(habit, name, value)
+        fields |= set(attrs)
+        updated.append(habit)
+    # Видимость до изменения нужна, чтобы убрать скрытые привычки из общей ленты, bulk_update ее сбросит
+    sync_saved_habits(updated)
+    if fields:
+        Habit.objects.bulk_update(updated, sorted(fields))
+    return updated
+
+
+@transaction.atomic
+def bulk_delete_habits(queryset: QuerySet, data: list[Any]) -> None:
+    """Удаляет пачку привычек из доступной пользователю выборки, на остальные id отвечает ошибками по индексам"""
+    queryset = queryset.filter(pk__in=get_habit_ids(data)).select_for_update()
+    found = set(queryset.values_list("pk", flat=True))
+    errors = {index: ["Привычка не найдена"] for index, value in enumerate(data) if get_habit_id(value) not in found}
+    if errors:
+        raise ValidationError(errors)
+    queryset.delete()
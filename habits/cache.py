@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+from typing import Any, Callable, Iterable, Optional
+
+import orjson
+import redis
+from django.conf import settings
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from crswrk_5.etags import is_not_modified, make_etag, not_modified
+from crswrk_5.redis_client import get_redis_client
+from crswrk_5.renderers import orjson_dumps
+
+logger = logging.getLogger(__name__)
+
+
+class HabitFeedCache:
+    """Кэш сериализованных страниц ленты привычек в Redis с версионированными ключами"""
+
+    def __init__(self, client: Optional[redis.Redis] = None, prefix: str = "habits:feed") -> None:
+        self.client = client or get_redis_client()
+        self.prefix = prefix
+        self.public_version_key = f"{prefix}:version:public"
+        self.hits_key = f"{prefix}:hits"
+        self.misses_key = f"{prefix}:misses"
+
+    def get_user_version_key(self, user_id: int) -> str:
+        """Возвращает ключ версии ленты пользователя"""
+        return f"{self.prefix}:version:user:{user_id}"
+
+    def get_page_key(self, user_id: int, request: Request) -> str:
+        """Возвращает ключ страницы: пользователь, версии его привычек и публичной ленты, параметры запроса"""
+        user_version, public_version = self.client.mget(self.get_user_version_key(user_id), self.public_version_key)
+        query = sorted(request.query_params.lists())
+        digest = hashlib.md5(json.dumps([request.get_host(), query]).encode()).hexdigest()
+        return f"{self.prefix}:page:{user_id}:{int(user_version or 0)}:{int(public_version or 0)}:{digest}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Возвращает закэшированную страницу и учитывает попадание или промах"""
+        value = self.client.get(key)
+        self.client.incr(self.hits_key if value is not None else self.misses_key)
+        return orjson.loads(value) if value is not None else None
+
+    def set(self, key: str, data: Any) -> None:
+        """Сохраняет страницу на HABITS_FEED_CACHE_TTL секунд"""
+        self.client.set(key, orjson_dumps(data), ex=settings.HABITS_FEED_CACHE_TTL)
+
+    def invalidate(self, user_ids: Iterable[int], public: bool = False) -> None:
+        """Сдвигает версии лент пользователей и, если изменилась публичная привычка, общую публичную версию"""
+        pipe = self.client.pipeline()
+        for user_id in set(user_ids):
+            pipe.incr(self.get_user_version_key(user_id))
+        if public:
+            pipe.incr(self.public_version_key)
+        pipe.execute()
+
+    def get_stats(self) -> dict[str, int]:
+        """Возвращает счетчики попаданий и промахов кэша"""
+        hits, misses = self.client.mget(self.hits_key, self.misses_key)
+        return {"hits": int(hits or 0), "misses": int(misses or 0)}
+
+
+def get_cached_feed_page(
+    user_id: int, request: Request, build: Callable[[], Response], use_etag: bool = True
+) -> Response:
+    """Отдает страницу ленты из кэша, при промахе строит ее через build и кэширует, без Redis просто строит"""
+    if not settings.HABITS_FEED_CACHE_ENABLED:
+        return build()
+    feed_cache = HabitFeedCache()
+    try:
+        key = feed_cache.get_page_key(user_id, request)
+        # Ключ страницы включает версии ленты, поэтому 304 отдается без чтения самой страницы
+        etag = make_etag(key) if use_etag else None
+        if etag is not None and is_not_modified(request, etag):
+            return not_modified(etag)
+        data = feed_cache.get(key)
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Кэш ленты привычек недоступен: {e}")
+        return build()
+    response = Response(data) if data is not None else build()
+    if data is None and response.status_code == 200:
+        try:
+            feed_cache.set(key, response.data)
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Не удалось сохранить страницу ленты привычек в кэш: {e}")
+    if etag is not None and response.status_code == 200:
+        response["ETag"] = etag
+    return response
+
+
+def invalidate_habit_feeds(user_ids: Iterable[int], public: bool = False) -> None:
+    """Сбрасывает кэш лент, ошибки Redis не мешают записи: устаревшие страницы истекут по TTL"""
+    if not settings.HABITS_FEED_CACHE_ENABLED:
+        return
+    try:
+        HabitFeedCache().invalidate(user_ids, public=public)
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Не удалось сбросить кэш ленты привычек: {e}")
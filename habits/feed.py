@@ -0,0 +1,123 @@
+import logging
+from datetime import time
+from typing import Any, Iterable, Optional
+
+import orjson
+import redis
+from django.conf import settings
+
+from crswrk_5.redis_client import get_redis_client
+from crswrk_5.renderers import orjson_dumps
+from habits.models import Habit
+from habits.serializers import HabitSerializer
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_FEED_KEY = "habits:public"
+
+# id привычки занимает младшие биты оценки, секунды от начала суток — старшие: порядок оценок совпадает
+# с порядком (time, id), а сами оценки меньше 2**53 и точно представимы в double
+FEED_SCORE_ID_BITS = 33
+
+
+def get_feed_score(value: time, habit_id: int) -> int:
+    """Возвращает оценку привычки в общей ленте, упорядоченную так же, как ключ (time, id)"""
+    seconds = value.hour * 3600 + value.minute * 60 + value.second
+    return (seconds << FEED_SCORE_ID_BITS) + habit_id
+
+
+class PublicHabitFeed:
+    """Общая для всех читателей лента публичных привычек: sorted set по (time, id) и хэш сериализованных привычек"""
+
+    batch_size = 500
+
+    def __init__(self, client: Optional[redis.Redis] = None, key: str = PUBLIC_FEED_KEY) -> None:
+        self.client = client or get_redis_client()
+        self.key = key
+        self.data_key = f"{key}:data"
+        self.ready_key = f"{key}:ready"
+
+    def is_ready(self) -> bool:
+        """Проверяет, что лента собрана и ее можно читать вместо базы"""
+        return bool(self.client.exists(self.ready_key))
+
+    def upsert(self, habits: Iterable[Habit], key: Optional[str] = None, data_key: Optional[str] = None) -> int:
+        """Добавляет привычки в ленту или обновляет их позицию и содержимое"""
+        count = 0
+        pipe = self.client.pipeline()
+        for habit in habits:
+            pipe.zadd(key or self.key, {str(habit.pk): get_feed_score(habit.time, habit.pk)})
+            pipe.hset(data_key or self.data_key, str(habit.pk), orjson_dumps(HabitSerializer(habit).data))
+            count += 1
+            if count % self.batch_size == 0:
+                pipe.execute()
+        pipe.execute()
+        return count
+
+    def remove(self, *habit_ids: int) -> None:
+        """Удаляет привычки из ленты"""
+        if habit_ids:
+            members = [str(habit_id) for habit_id in habit_ids]
+            pipe = self.client.pipeline()
+            pipe.zrem(self.key, *members)
+            pipe.hdel(self.data_key, *members)
+            pipe.execute()
+
+    def read(
+        self, after: Optional[int], reverse: bool, limit: int, exclude_user_id: Optional[int] = None
+    ) -> list[tuple[int, dict[str, Any]]]:
+        """Возвращает до limit привычек за оценкой after в направлении чтения, пропуская привычки exclude_user_id"""
+        rows: list[tuple[int, dict[str, Any]]] = []
+        bound = f"({after}" if after is not None else None
+        while len(rows) < limit:
+            if reverse:
+                items = self.client.zrevrangebyscore(
+                    self.key, bound or "+inf", "-inf", start=0, num=self.batch_size, withscores=True
+                )
+            else:
+                items = self.client.zrangebyscore(
+                    self.key, bound or "-inf", "+inf", start=0, num=self.batch_size, withscores=True
+                )
+            if not items:
+                break
+            values = self.client.hmget(self.data_key, [member for member, _ in items])
+            for (_, score), value in zip(items, values):
+                if value is None:
+                    continue
+                data = orjson.loads(value)
+                if data["user"] != exclude_user_id:
+                    rows.append((int(score), data))
+            if len(items) < self.batch_size:
+                break
+            bound = f"({int(items[-1][1])}"
+        return rows[:limit]
+
+    def rebuild(self) -> int:
+        """Заново собирает ленту из базы и атомарно подменяет ею текущую"""
+        temp_key, temp_data_key = f"{self.key}:rebuild", f"{self.data_key}:rebuild"
+        self.client.delete(temp_key, temp_data_key)
+        habits = Habit.objects.filter(is_public=True).order_by("pk").iterator(chunk_size=self.batch_size)
+        count = self.upsert(habits, key=temp_key, data_key=temp_data_key)
+        pipe = self.client.pipeline()
+        if count:
+            pipe.rename(temp_key, self.key)
+            pipe.rename(temp_data_key, self.data_key)
+        else:
+            pipe.delete(self.key, self.data_key)
+        pipe.set(self.ready_key, 1)
+        pipe.execute()
+        return count
+
+
+def sync_public_feed(habit_ids: Iterable[int]) -> None:
+    """Переносит в общую ленту текущее состояние привычек из базы, ошибки Redis исправит пересборка ленты"""
+    if not settings.HABITS_PUBLIC_FEED_ENABLED:
+        return
+    habit_ids = set(habit_ids)
+    try:
+        public_feed = PublicHabitFeed()
+        public_habits = list(Habit.objects.filter(pk__in=habit_ids, is_public=True))
+        public_feed.upsert(public_habits)
+        public_feed.remove(*(habit_ids - {habit.pk for habit in public_habits}))
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Не удалось обновить общую ленту публичных привычек: {e}")
@@ -0,0 +1,75 @@
+import random
+import statistics
+import time as timer
+from datetime import datetime, time, timedelta
+from typing import Any
+
+from django.core.management import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from habits.models import Habit
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Команда для замера длительности выборки привычек одного тика напоминаний в зависимости от размера таблицы"""
+
+    help = "Замеряет время выборки привычек для тика напоминаний на таблицах разного размера"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет параметры замера"""
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Наполняет таблицу привычками и сравнивает выборку по индексу с выборкой через EXTRACT"""
+        tick = timezone.now().replace(second=0, microsecond=0)
+        self.stdout.write(f"{'rows':>12} {'indexed, ms':>14} {'extract, ms':>14} {'due':>8}")
+        with transaction.atomic():
+            user = User.objects.create(email="bench-reminders@example.com")
+            total = 0
+            for size in sorted(options["sizes"]):
+                total += self._fill(user, tick, size - total, options["batch_size"])
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE habits_habit")
+                indexed = Habit.objects.filter(next_due_at__lte=tick)
+                legacy = Habit.objects.filter(time__hour=tick.hour, time__minute=tick.minute)
+                indexed_ms = self._measure(indexed, options["repeat"])
+                legacy_ms = self._measure(legacy, options["repeat"])
+                self.stdout.write(f"{total:>12} {indexed_ms:>14.2f} {legacy_ms:>14.2f} {indexed.count():>8}")
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _fill(user: User, tick: datetime, count: int, batch_size: int) -> int:
+        """Создает привычки со сроками, равномерно распределенными по суткам, начиная с минуты тика"""
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            due_dates = [tick + timedelta(minutes=random.randrange(24 * 60)) for _ in range(size)]
+            Habit.objects.bulk_create(
+                Habit(
+                    user=user,
+                    place="bench",
+                    action="bench",
+                    time=time(due_at.hour, due_at.minute),
+                    next_due_at=due_at,
+                    duration=60,
+                    reward="bench",
+                )
+                for due_at in due_dates
+            )
+            created += size
+        return created
+
+    @staticmethod
+    def _measure(queryset: QuerySet, repeat: int) -> float:
+        """Возвращает медианное время выборки идентификаторов привычек в миллисекундах"""
+        samples = []
+        for _ in range(repeat):
+            started = timer.perf_counter()
+            list(queryset.values_list("id", flat=True))
+            samples.append((timer.perf_counter() - started) * 1000)
+        return statistics.median(samples)
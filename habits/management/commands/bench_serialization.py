@@ -0,0 +1,72 @@
+import statistics
+import time as timer
+from datetime import time
+from typing import Any, Callable
+
+from django.core.management import BaseCommand, CommandParser
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from crswrk_5.renderers import ORJSONRenderer
+from crswrk_5.serializers import ValuesSerializer
+from habits.models import Habit
+from habits.serializers import HabitSerializer
+from users.models import User
+from users.serializers import UserPublicSerializer
+
+
+class Command(BaseCommand):
+    """Команда для сравнения стоимости сериализации списков через ModelSerializer и через строки .values()"""
+
+    help = (
+        "Сравнивает ModelSerializer + JSONRenderer со строками .values() + ORJSONRenderer для привычек и пользователей"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет параметры замера"""
+        parser.add_argument("--objects", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Наполняет таблицы и выводит время на объект и пропускную способность в байтах в секунду"""
+        count, repeat = options["objects"], options["repeat"]
+        self.stdout.write(f"{'path':>22} {'us/object':>12} {'MB/s':>10} {'bytes':>10}")
+        with transaction.atomic():
+            users = User.objects.bulk_create(User(email=f"bench-serialization{i}@example.com") for i in range(count))
+            Habit.objects.bulk_create(
+                Habit(user=users[0], place="bench", action="bench", time=time(i % 24, i % 60), duration=60)
+                for i in range(count)
+            )
+            habits = Habit.objects.filter(user=users[0]).order_by("time", "id")
+            users_queryset = User.objects.filter(email__startswith="bench-serialization").order_by("id")
+            paths: dict[str, Callable[[], bytes]] = {
+                "habits serializer": lambda: JSONRenderer().render(HabitSerializer(habits, many=True).data),
+                "habits values": lambda: ORJSONRenderer().render(self._values(HabitSerializer, habits)),
+                "users serializer": lambda: JSONRenderer().render(
+                    UserPublicSerializer(users_queryset, many=True).data
+                ),
+                "users values": lambda: ORJSONRenderer().render(self._values(UserPublicSerializer, users_queryset)),
+            }
+            for name, render in paths.items():
+                seconds, size = self._measure(render, repeat)
+                self.stdout.write(
+                    f"{name:>22} {seconds / count * 1e6:>12.2f} {size / seconds / 1e6:>10.2f} {size:>10}"
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _values(serializer_class: Any, queryset: Any) -> list[dict[str, Any]]:
+        """Сериализует выборку быстрым путем"""
+        serializer = ValuesSerializer(serializer_class)
+        return serializer.to_representation(serializer.values(queryset))
+
+    @staticmethod
+    def _measure(render: Callable[[], bytes], repeat: int) -> tuple[float, int]:
+        """Возвращает медианное время выборки, сериализации и рендеринга в секундах и размер ответа в байтах"""
+        samples = []
+        size = 0
+        for _ in range(repeat):
+            started = timer.perf_counter()
+            size = len(render())
+            samples.append(timer.perf_counter() - started)
+        return statistics.median(samples), size
@@ -0,0 +1,41 @@
+import time
+from typing import Any
+
+import requests
+from django.core.management import BaseCommand, CommandParser
+
+from habits.services import TelegramSender
+from habits.telegram_stub import TelegramStubServer
+
+
+class Command(BaseCommand):
+    """Команда для замера пропускной способности отправки напоминаний на локальной заглушке телеграма"""
+
+    help = "Сравнивает последовательную отправку без сессии с пачечной отправкой через пул соединений"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет параметры замера"""
+        parser.add_argument("--messages", type=int, default=500)
+        parser.add_argument("--latency", type=float, default=0.02, help="Задержка ответа заглушки в секундах")
+        parser.add_argument("--workers", type=int, default=16)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Отправляет одинаковый набор сообщений обоими способами и выводит сообщения в секунду"""
+        messages = [(chat_id, f"Напоминание {chat_id}") for chat_id in range(options["messages"])]
+        with TelegramStubServer(latency=options["latency"]) as server:
+            started = time.perf_counter()
+            for chat_id, text in messages:
+                requests.get(f"{server.url}token/sendMessage", params={"chat_id": chat_id, "text": text}, timeout=10)
+            self._report("serial, no session", len(messages), time.perf_counter() - started, server.connections)
+
+            connections = server.connections
+            sender = TelegramSender(base_url=server.url, token="token", max_workers=options["workers"])
+            started = time.perf_counter()
+            results = sender.send_batch(messages)
+            elapsed = time.perf_counter() - started
+            sender.close()
+            self._report("pooled batch", sum(r.ok for r in results), elapsed, server.connections - connections)
+
+    def _report(self, name: str, sent: int, elapsed: float, connections: int) -> None:
+        """Выводит результат одного замера"""
+        self.stdout.write(f"{name:<20} sent={sent:<6} {sent / elapsed:>10.1f} msg/s  connections={connections}")
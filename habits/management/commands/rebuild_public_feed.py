@@ -0,0 +1,16 @@
+from typing import Any
+
+from django.core.management import BaseCommand
+
+from habits.feed import PublicHabitFeed
+
+
+class Command(BaseCommand):
+    """Команда для пересборки общей ленты публичных привычек в Redis"""
+
+    help = "Пересобирает общую ленту публичных привычек в Redis из базы"
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Пересобирает ленту и выводит количество привычек в ней"""
+        count = PublicHabitFeed().rebuild()
+        self.stdout.write(f"В общую ленту загружено публичных привычек: {count}")
@@ -0,0 +1,27 @@
+from typing import Any
+
+from django.core.management import BaseCommand, CommandParser
+from django.utils import timezone
+
+from habits.schedule import ReminderSchedule
+
+
+class Command(BaseCommand):
+    """Команда для пересборки расписания напоминаний в Redis и сверки его с базой"""
+
+    help = "Пересобирает расписание напоминаний в Redis из базы и сверяет его с базой"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет параметры пересборки"""
+        parser.add_argument("--verify-only", action="store_true", help="Только сверить расписание с базой")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Пересобирает расписание и выводит расхождения с базой"""
+        schedule = ReminderSchedule()
+        if not options["verify_only"]:
+            added = schedule.rebuild(timezone.now())
+            self.stdout.write(f"В расписание загружено привычек: {added}, до {schedule.get_loaded_until()}")
+        missing, extra = schedule.verify()
+        self.stdout.write(f"Отсутствуют в расписании: {len(missing)}, лишние в расписании: {len(extra)}")
+        if missing or extra:
+            self.stderr.write(f"Отсутствуют: {sorted(missing)[:20]}, лишние: {sorted(extra)[:20]}")
@@ -0,0 +1,42 @@
+from typing import Any
+
+from django.core.management import BaseCommand, CommandParser
+
+from habits.telegram_stub import TelegramStubServer
+
+
+class Command(BaseCommand):
+    """Команда для запуска локальной заглушки Telegram Bot API"""
+
+    help = "Запускает локальную заглушку Telegram Bot API, ее адрес подставляется в TELEGRAM_URL"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет параметры заглушки"""
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8081)
+        parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа в секундах")
+        parser.add_argument("--global-rate", type=float, help="Лимит сообщений в секунду на весь бот")
+        parser.add_argument("--chat-rate", type=float, help="Лимит сообщений в секунду в один чат")
+        parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответе 429")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Запускает заглушку до прерывания"""
+        server = TelegramStubServer(
+            options["host"],
+            options["port"],
+            options["latency"],
+            global_rate=options["global_rate"],
+            chat_rate=options["chat_rate"],
+            retry_after=options["retry_after"],
+        )
+        self.stdout.write(f"TELEGRAM_URL={server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(
+                f"Принято сообщений: {len(server.messages)}, отклонено по лимиту: {server.rejected}, "
+                f"соединений: {server.connections}"
+            )
@@ -0,0 +1,28 @@
+from typing import Any
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+
+def fill_minute_of_day(apps: Any, schema_editor: Any) -> None:
+    """Заполняет минуту суток для существующих привычек одним запросом"""
+    Habit = apps.get_model("habits", "Habit")
+    Habit.objects.update(minute_of_day=ExtractHour("time") * 60 + ExtractMinute("time"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="minute_of_day",
+            field=models.PositiveSmallIntegerField(
+                db_index=True, default=0, editable=False, verbose_name="Минута суток для отправки напоминания"
+            ),
+        ),
+        migrations.RunPython(fill_minute_of_day, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0003_habit_minute_of_day"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderOutbox",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("chat_id", models.CharField(max_length=50, verbose_name="Телеграм chat_id")),
+                ("message", models.TextField(verbose_name="Текст напоминания")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Ожидает отправки"),
+                            ("delivered", "Доставлено"),
+                            ("failed", "Не доставлено"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Статус отправки",
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0, verbose_name="Количество неудачных попыток")),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(default=django.utils.timezone.now, verbose_name="Время следующей попытки"),
+                ),
+                ("last_error", models.TextField(blank=True, default="", verbose_name="Последняя ошибка")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Время постановки в очередь")),
+                ("sent_at", models.DateTimeField(blank=True, null=True, verbose_name="Время доставки")),
+            ],
+            options={
+                "verbose_name": "Исходящее напоминание",
+                "verbose_name_plural": "Исходящие напоминания",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["next_attempt_at"],
+                        name="habits_outbox_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
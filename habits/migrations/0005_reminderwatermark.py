@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0004_reminderoutbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=50, unique=True, verbose_name="Название конвейера")),
+                ("dispatched_until", models.DateTimeField(verbose_name="Напоминания поставлены в очередь до")),
+            ],
+            options={
+                "verbose_name": "Отметка отправки напоминаний",
+                "verbose_name_plural": "Отметки отправки напоминаний",
+            },
+        ),
+    ]
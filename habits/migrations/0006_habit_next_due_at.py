@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:22
+
+from typing import Any
+
+from django.db import migrations, models
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+
+def fill_next_due_at(apps: Any, schema_editor: Any) -> None:
+    """Заполняет срок следующего напоминания для существующих привычек одним запросом"""
+    Habit = apps.get_model("habits", "Habit")
+    current = timezone.now()
+    Habit.objects.update(
+        next_due_at=RawSQL(
+            "date_trunc('day', %s::timestamptz) + date_trunc('minute', time) + CASE "
+            "WHEN date_trunc('day', %s::timestamptz) + date_trunc('minute', time) > %s::timestamptz "
+            "THEN interval '0 days' ELSE interval '1 day' END",
+            (current, current, current),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0005_reminderwatermark"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="next_due_at",
+            field=models.DateTimeField(
+                db_index=True, editable=False, null=True, verbose_name="Время следующего напоминания"
+            ),
+        ),
+        migrations.RunPython(fill_next_due_at, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="habit",
+            name="minute_of_day",
+        ),
+    ]
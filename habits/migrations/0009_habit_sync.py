@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:58
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0008_habit_feed_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitTombstone",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("habit_id", models.BigIntegerField(verbose_name="id привычки")),
+                ("owner_id", models.BigIntegerField(verbose_name="id владельца привычки")),
+                ("is_public", models.BooleanField(verbose_name="Привычка была видна всем пользователям")),
+                ("is_deleted", models.BooleanField(default=True, verbose_name="Привычка удалена, а не скрыта")),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, verbose_name="Время удаления или скрытия"),
+                ),
+            ],
+            options={
+                "verbose_name": "Отметка об удалении привычки",
+                "verbose_name_plural": "Отметки об удалении привычек",
+            },
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="Время последнего изменения"),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(fields=["updated_at", "id"], name="habits_habit_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="habittombstone",
+            index=models.Index(fields=["created_at", "id"], name="habits_tombstone_created_idx"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0009_habit_sync"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="reminderwatermark",
+            options={
+                "verbose_name": "Блокировка отправки напоминаний",
+                "verbose_name_plural": "Блокировки отправки напоминаний",
+            },
+        ),
+        migrations.RemoveField(
+            model_name="reminderwatermark",
+            name="dispatched_until",
+        ),
+    ]
@@ -1,14 +1,126 @@
-from typing import Any
+from datetime import datetime, time, timedelta
+from typing import Any, Iterable, Sequence
 
 from django.db import models
+from django.db.models.expressions import RawSQL
+from django.dispatch import Signal
+from django.utils import timezone
 
 from users.models import User
 
+# Отправляется после скрытия публичных привычек через update() со списком пар (id привычки, id владельца)
+habits_hidden = Signal()
+
+# Отправляется после изменения расписания привычек через update() со списком их id
+habits_rescheduled = Signal()
+
+# Ближайший момент после %s, когда наступает время привычки: сегодня или завтра
+NEXT_DUE_AT_SQL = (
+    "date_trunc('day', %s::timestamptz) + date_trunc('minute', time) + CASE "
+    "WHEN date_trunc('day', %s::timestamptz) + date_trunc('minute', time) > %s::timestamptz "
+    "THEN interval '0 days' ELSE interval '1 day' END"
+)
+
+# Сдвигает next_due_at на минимальное число периодов, после которого срок оказывается позже %s
+ADVANCE_NEXT_DUE_AT_SQL = (
+    "next_due_at + make_interval(days => periodicity * "
+    "(floor(extract(epoch from (%s::timestamptz - next_due_at)) / (periodicity * 86400))::int + 1))"
+)
+
+
+def get_next_due_at(value: time, after: datetime) -> datetime:
+    """Возвращает ближайший момент после after, когда наступает время привычки"""
+    due_at = after.replace(hour=value.hour, minute=value.minute, second=0, microsecond=0)
+    if due_at <= after:
+        due_at += timedelta(days=1)
+    return due_at
+
+
+class HabitQuerySet(models.QuerySet):
+    """Набор запросов привычек, поддерживающий актуальность срока напоминания при массовых операциях"""
+
+    def bulk_create(self, objs: Iterable["Habit"], *args: Any, **kwargs: Any) -> list["Habit"]:
+        """Заполняет срок следующего напоминания перед массовым созданием привычек"""
+        objs = list(objs)
+        current = timezone.now()
+        for obj in objs:
+            if obj.next_due_at is None:
+                obj.next_due_at = get_next_due_at(obj.time, current)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs: Iterable["Habit"], fields: Sequence[str], *args: Any, **kwargs: Any) -> int:
+        """Пересчитывает срок напоминания, если массово обновляется расписание, и отмечает изменение привычек"""
+        objs = list(objs)
+        fields = list(fields)
+        current = timezone.now()
+        if {"time", "periodicity"} & set(fields) and "next_due_at" not in fields:
+            for obj in objs:
+                schedule = (obj.time, obj.periodicity)
+                if getattr(obj, "_loaded_schedule", None) != schedule:
+                    obj.next_due_at = get_next_due_at(obj.time, current)
+                    obj._loaded_schedule = schedule
+            fields.append("next_due_at")
+        if set(fields) - {"next_due_at", "updated_at"}:
+            for obj in objs:
+                obj.updated_at = current
+            fields.append("updated_at")
+        if "is_public" in fields:
+            hidden = [obj for obj in objs if getattr(obj, "_loaded_is_public", False) and not obj.is_public]
+            HabitTombstone.objects.bulk_create(HabitTombstone.hidden(obj.pk, obj.user_id, current) for obj in hidden)
+            for obj in objs:
+                obj._loaded_is_public = obj.is_public
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs: Any) -> int:
+        """Пересчитывает срок напоминания при обновлении расписания через update() и отмечает изменение привычек"""
+        current = timezone.now()
+        if set(kwargs) - {"next_due_at"} and "updated_at" not in kwargs:
+            kwargs["updated_at"] = current
+        hidden: list[tuple[int, int]] = []
+        if kwargs.get("is_public") is False:
+            hidden = list(self.filter(is_public=True).values_list("pk", "user_id"))
+            HabitTombstone.objects.bulk_create(
+                HabitTombstone.hidden(habit_id, user_id, current) for habit_id, user_id in hidden
+            )
+        rows = self._update_schedule(current, **kwargs)
+        if hidden:
+            habits_hidden.send(sender=self.model, hidden=hidden)
+        return rows
+
+    def _update_schedule(self, current: datetime, **kwargs: Any) -> int:
+        """Выполняет update(), пересчитывая срок напоминания, если меняется расписание"""
+        if not {"time", "periodicity"} & set(kwargs) or "next_due_at" in kwargs:
+            return super().update(**kwargs)
+        # id нужны до записи: фильтр выборки может зависеть от изменяемых полей
+        pks = list(self.values_list("pk", flat=True))
+        value = kwargs.get("time")
+        next_due_at = RawSQL(NEXT_DUE_AT_SQL, (current, current, current))
+        if isinstance(value, time):
+            kwargs["next_due_at"] = get_next_due_at(value, current)
+            rows = super().update(**kwargs)
+        elif "time" not in kwargs:
+            kwargs["next_due_at"] = next_due_at
+            rows = super().update(**kwargs)
+        else:
+            rows = super().update(**kwargs)
+            self.model.objects.filter(pk__in=pks).update(next_due_at=next_due_at)
+        if pks:
+            habits_rescheduled.send(sender=self.model, habit_ids=pks)
+        return rows
+
+    def feed_for(self, user: User) -> "HabitQuerySet":
+        """Возвращает ленту пользователя одним условием: свои привычки и публичные привычки других"""
+        return self.filter(models.Q(user=user) | models.Q(is_public=True))
+
+    def advance_next_due_at(self, current: datetime) -> int:
+        """Сдвигает сроки напоминаний на целое число периодов так, чтобы они оказались позже current"""
+        return self.update(next_due_at=RawSQL(ADVANCE_NEXT_DUE_AT_SQL, (current,)))
+
 
 class Habit(models.Model):
     """Модель привычки, описывает привычку пользователя"""
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     place = models.CharField(max_length=100, verbose_name="Место выполнения привычки")
     time = models.TimeField(verbose_name="Время, когда необходимо выполнять привычку")
     action = models.CharField(max_length=100, verbose_name="Выполняемое действие")
@@ -20,10 +132,134 @@ class Habit(models.Model):
     reward = models.CharField(max_length=100, null=True, blank=True, verbose_name="Вознаграждение")
     duration = models.PositiveIntegerField(verbose_name="Время на выполнение привычки в секундах")
     is_public = models.BooleanField(default=False, verbose_name="Признак публичности")
+    next_due_at = models.DateTimeField(
+        null=True, db_index=True, editable=False, verbose_name="Время следующего напоминания"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Время последнего изменения")
+
+    objects = HabitQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Привычка"
         verbose_name_plural = "Привычки"
+        indexes = [
+            models.Index(fields=["time", "id"], name="habits_habit_time_id_idx"),
+            models.Index(fields=["user", "time", "id"], name="habits_habit_user_time_idx"),
+            models.Index(
+                fields=["time", "id"], condition=models.Q(is_public=True), name="habits_habit_public_time_idx"
+            ),
+            models.Index(fields=["updated_at", "id"], name="habits_habit_updated_idx"),
+        ]
 
     def __str__(self) -> Any:
         return self.place
+
+    @classmethod
+    def from_db(cls, db: Any, field_names: Any, values: Any) -> "Habit":
+        """Запоминает загруженное расписание, чтобы пересчитывать срок только при его изменении"""
+        instance = super().from_db(db, field_names, values)
+        # Если расписание отложено через only() или defer(), прежнее значение неизвестно и сравнение пропускается
+        if "time" in field_names and "periodicity" in field_names:
+            instance._loaded_schedule = (instance.time, instance.periodicity)
+        instance._loaded_is_public = instance.__dict__.get("is_public")
+        return instance
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        """Пересчитывает срок следующего напоминания при создании привычки и изменении расписания"""
+        loaded_schedule = getattr(self, "_loaded_schedule", None)
+        if self.next_due_at is None or (
+            loaded_schedule is not None and loaded_schedule != (self.time, self.periodicity)
+        ):
+            self.next_due_at = get_next_due_at(self.time, timezone.now())
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "next_due_at"}
+        super().save(*args, **kwargs)
+        if not {"time", "periodicity"} & self.get_deferred_fields():
+            self._loaded_schedule = (self.time, self.periodicity)
+        self._loaded_is_public = self.is_public
+
+
+class HabitTombstoneQuerySet(models.QuerySet):
+    """Набор запросов отметок об удалении и скрытии привычек"""
+
+    def visible_to(self, user: User) -> "HabitTombstoneQuerySet":
+        """Возвращает отметки для ленты пользователя: удаление своих, удаление и скрытие чужих публичных привычек"""
+        return self.filter(
+            models.Q(owner_id=user.pk, is_deleted=True) | (models.Q(is_public=True) & ~models.Q(owner_id=user.pk))
+        )
+
+
+class HabitTombstone(models.Model):
+    """Отметка об удалении привычки или о скрытии публичной привычки для дельта-синхронизации клиентов"""
+
+    # Владелец хранится без внешнего ключа: отметки переживают удаление пользователя вместе с его привычками
+    habit_id = models.BigIntegerField(verbose_name="id привычки")
+    owner_id = models.BigIntegerField(verbose_name="id владельца привычки")
+    is_public = models.BooleanField(verbose_name="Привычка была видна всем пользователям")
+    is_deleted = models.BooleanField(default=True, verbose_name="Привычка удалена, а не скрыта")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Время удаления или скрытия")
+
+    objects = HabitTombstoneQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Отметка об удалении привычки"
+        verbose_name_plural = "Отметки об удалении привычек"
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="habits_tombstone_created_idx"),
+        ]
+
+    def __str__(self) -> Any:
+        return f"{self.habit_id}: {self.created_at}"
+
+    @classmethod
+    def hidden(cls, habit_id: int, owner_id: int, created_at: datetime) -> "HabitTombstone":
+        """Возвращает отметку о скрытии публичной привычки от других пользователей"""
+        return cls(habit_id=habit_id, owner_id=owner_id, is_public=True, is_deleted=False, created_at=created_at)
+
+
+class ReminderOutbox(models.Model):
+    """Исходящее напоминание в телеграм, ожидающее отправки воркером"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Ожидает отправки"
+        DELIVERED = "delivered", "Доставлено"
+        FAILED = "failed", "Не доставлено"
+
+    chat_id = models.CharField(max_length=50, verbose_name="Телеграм chat_id")
+    message = models.TextField(verbose_name="Текст напоминания")
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name="Статус отправки"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Количество неудачных попыток")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Время следующей попытки")
+    last_error = models.TextField(blank=True, default="", verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время постановки в очередь")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Время доставки")
+
+    class Meta:
+        verbose_name = "Исходящее напоминание"
+        verbose_name_plural = "Исходящие напоминания"
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="pending"),
+                name="habits_outbox_pending_idx",
+            ),
+        ]
+
+    def __str__(self) -> Any:
+        return f"{self.chat_id}: {self.status}"
+
+
+class ReminderWatermark(models.Model):
+    """Строка-блокировка конвейера напоминаний, которая не дает пересекающимся тикам дублировать отправку"""
+
+    name = models.CharField(max_length=50, unique=True, verbose_name="Название конвейера")
+
+    class Meta:
+        verbose_name = "Блокировка отправки напоминаний"
+        verbose_name_plural = "Блокировки отправки напоминаний"
+
+    def __str__(self) -> Any:
+        return self.name
@@ -1,4 +1,15 @@
+import heapq
+from itertools import islice
+from operator import itemgetter
+from typing import Any
+
+from django.db.models import QuerySet
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+
+from crswrk_5.pagination import KeysetCursorPagination
+from habits.feed import PublicHabitFeed, get_feed_score
+from habits.models import Habit
 
 
 class HabitPageNumberPagination(PageNumberPagination):
@@ -7,3 +18,26 @@ class HabitPageNumberPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 10
+
+
+class HabitCursorPagination(KeysetCursorPagination):
+    """Курсорная пагинация ленты привычек по ключу (time, id)"""
+
+    model = Habit
+    ordering = ("time", "id")
+    page_size = 5
+    max_page_size = 10
+
+    def paginate_feed(
+        self, request: Request, own_rows: QuerySet, public_feed: PublicHabitFeed
+    ) -> list[dict[str, Any]]:
+        """Собирает страницу ленты слиянием строк своих привычек из базы с общей лентой публичных привычек"""
+        self.start_page(request)
+        own = [
+            (get_feed_score(row["time"], row["id"]), row)
+            for row in self.filter_after_position(own_rows)[: self.page_size + 1]
+        ]
+        after = get_feed_score(*self.position) if self.position is not None else None
+        public = public_feed.read(after, self.is_reverse, self.page_size + 1, exclude_user_id=request.user.pk)
+        merged = heapq.merge(own, public, key=itemgetter(0), reverse=self.is_reverse)
+        return self.finish_page([row for _, row in islice(merged, self.page_size + 1)])
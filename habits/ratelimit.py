@@ -0,0 +1,91 @@
+import logging
+import time
+from typing import Any, Optional
+
+import redis
+from django.conf import settings
+
+from crswrk_5.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# KEYS: общий бакет, бакет чата. ARGV: скорость и емкость общего бакета, скорость и емкость бакета чата.
+# Время берется из Redis, чтобы у всех воркеров были одни часы.
+# Возвращает 0, если токены списаны, иначе сколько миллисекунд ждать до появления токенов в обоих бакетах.
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+
+local function refill(key, rate, burst)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    return math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+end
+
+local function store(key, tokens, rate, burst)
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+end
+
+local global_rate, global_burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local chat_rate, chat_burst = tonumber(ARGV[3]), tonumber(ARGV[4])
+local global_tokens = refill(KEYS[1], global_rate, global_burst)
+local chat_tokens = refill(KEYS[2], chat_rate, chat_burst)
+
+if global_tokens >= 1 and chat_tokens >= 1 then
+    store(KEYS[1], global_tokens - 1, global_rate, global_burst)
+    store(KEYS[2], chat_tokens - 1, chat_rate, chat_burst)
+    return 0
+end
+
+store(KEYS[1], global_tokens, global_rate, global_burst)
+store(KEYS[2], chat_tokens, chat_rate, chat_burst)
+local global_wait = math.max(0, 1 - global_tokens) / global_rate
+local chat_wait = math.max(0, 1 - chat_tokens) / chat_rate
+return math.max(1, math.ceil(math.max(global_wait, chat_wait) * 1000))
+"""
+
+
+class TelegramRateLimiter:
+    """Общий для всех воркеров лимит отправки в телеграм: token bucket в Redis на весь бот и на каждый чат"""
+
+    def __init__(
+        self,
+        client: Optional[redis.Redis] = None,
+        global_rate: Optional[float] = None,
+        global_burst: Optional[int] = None,
+        chat_rate: Optional[float] = None,
+        chat_burst: Optional[int] = None,
+        prefix: str = "telegram:ratelimit",
+    ) -> None:
+        self.client = client or get_redis_client()
+        self.global_rate = global_rate or settings.TELEGRAM_GLOBAL_RATE
+        self.global_burst = global_burst or settings.TELEGRAM_GLOBAL_BURST
+        self.chat_rate = chat_rate or settings.TELEGRAM_CHAT_RATE
+        self.chat_burst = chat_burst or settings.TELEGRAM_CHAT_BURST
+        self.prefix = prefix
+        self.script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def acquire(self, chat_id: Any) -> float:
+        """Пытается списать токен, возвращает 0 при успехе или время ожидания в секундах"""
+        keys = [f"{self.prefix}:global", f"{self.prefix}:chat:{chat_id}"]
+        args = [self.global_rate, self.global_burst, self.chat_rate, self.chat_burst]
+        try:
+            wait_ms = self.script(keys=keys, args=args)
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Лимит отправки в Telegram недоступен, отправка без ограничения: {e}")
+            return 0.0
+        return int(wait_ms) / 1000
+
+    def wait(self, chat_id: Any, max_wait: Optional[float] = None) -> float:
+        """Ждет токен не дольше max_wait, возвращает 0 при успехе или оставшееся время ожидания"""
+        max_wait = settings.TELEGRAM_RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            delay = self.acquire(chat_id)
+            if not delay:
+                return 0.0
+            if time.monotonic() + delay > deadline:
+                return delay
+            time.sleep(delay)
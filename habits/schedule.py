@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+import redis
+from django.conf import settings
+
+from crswrk_5.redis_client import get_redis_client
+from habits.models import Habit
+
+SCHEDULE_KEY = "habits:schedule"
+
+# Атомарно забирает из расписания до ARGV[2] привычек со временем отправки не позже ARGV[1]
+POP_DUE_SCRIPT = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+local ids = {}
+for i = 1, #items, 2 do
+    ids[#ids + 1] = items[i]
+end
+if #ids > 0 then
+    redis.call('ZREM', KEYS[1], unpack(ids))
+end
+return items
+"""
+
+
+class ReminderSchedule:
+    """Расписание напоминаний на ближайшие часы: sorted set в Redis, id привычки с оценкой по времени отправки"""
+
+    batch_size = 5000
+
+    def __init__(self, client: Optional[redis.Redis] = None, key: str = SCHEDULE_KEY) -> None:
+        self.client = client or get_redis_client()
+        self.key = key
+        self.loaded_until_key = f"{key}:loaded_until"
+        self.pop_script = self.client.register_script(POP_DUE_SCRIPT)
+
+    @property
+    def horizon(self) -> timedelta:
+        """Возвращает глубину расписания"""
+        return timedelta(hours=settings.REMINDERS_SCHEDULE_HORIZON_HOURS)
+
+    def get_loaded_until(self) -> Optional[datetime]:
+        """Возвращает момент, до которого расписание загружено из базы"""
+        value = self.client.get(self.loaded_until_key)
+        return datetime.fromtimestamp(float(value), tz=timezone.utc) if value else None
+
+    def add(self, entries: Iterable[tuple[int, datetime]], key: Optional[str] = None) -> int:
+        """Добавляет привычки в расписание или обновляет их время отправки"""
+        added = 0
+        mapping: dict[str, float] = {}
+        for habit_id, due_at in entries:
+            mapping[str(habit_id)] = due_at.timestamp()
+            if len(mapping) >= self.batch_size:
+                added += int(self.client.zadd(key or self.key, mapping))
+                mapping = {}
+        if mapping:
+            added += int(self.client.zadd(key or self.key, mapping))
+        return added
+
+    def remove(self, *habit_ids: int) -> None:
+        """Удаляет привычки из расписания"""
+        if habit_ids:
+            self.client.zrem(self.key, *(str(habit_id) for habit_id in habit_ids))
+
+    def sync(self, entries: Iterable[tuple[int, Optional[datetime]]]) -> None:
+        """Приводит записи привычек в расписании в соответствие со сроками из базы"""
+        loaded_until = self.get_loaded_until()
+        scheduled, removed = [], []
+        for habit_id, next_due_at in entries:
+            if next_due_at is not None and loaded_until is not None and next_due_at <= loaded_until:
+                scheduled.append((habit_id, next_due_at))
+            else:
+                removed.append(habit_id)
+        self.add(scheduled)
+        self.remove(*removed)
+
+    def pop_due(self, current: datetime) -> list[tuple[int, datetime]]:
+        """Атомарно забирает из расписания привычки со временем отправки не позже current"""
+        popped = []
+        while True:
+            items = self.pop_script(keys=[self.key], args=[current.timestamp(), self.batch_size])
+            popped.extend(
+                (int(items[i]), datetime.fromtimestamp(float(items[i + 1]), tz=timezone.utc))
+                for i in range(0, len(items), 2)
+            )
+            if len(items) < self.batch_size * 2:
+                return popped
+
+    def load(self, current: datetime) -> int:
+        """Догружает в расписание привычки, срок которых попадает в окно до current + horizon"""
+        loaded_until = self.get_loaded_until()
+        until = current + self.horizon
+        habits = Habit.objects.filter(next_due_at__lte=until)
+        if loaded_until is not None:
+            habits = habits.filter(next_due_at__gt=loaded_until)
+        added = self.add(habits.values_list("id", "next_due_at").iterator())
+        if loaded_until is None or until > loaded_until:
+            self.client.set(self.loaded_until_key, until.timestamp())
+        return added
+
+    def rebuild(self, current: datetime) -> int:
+        """Заново строит расписание из базы и атомарно подменяет им текущее"""
+        until = current + self.horizon
+        temp_key = f"{self.key}:rebuild"
+        self.client.delete(temp_key)
+        habits = Habit.objects.filter(next_due_at__lte=until).values_list("id", "next_due_at").iterator()
+        added = self.add(habits, key=temp_key)
+        pipe = self.client.pipeline()
+        if added:
+            pipe.rename(temp_key, self.key)
+        else:
+            pipe.delete(self.key)
+        pipe.set(self.loaded_until_key, until.timestamp())
+        pipe.execute()
+        return added
+
+    def verify(self) -> tuple[set[int], set[int]]:
+        """Сравнивает расписание с базой, возвращает отсутствующие в расписании и лишние в нем привычки"""
+        loaded_until = self.get_loaded_until()
+        if loaded_until is None:
+            return set(Habit.objects.filter(next_due_at__isnull=False).values_list("id", flat=True)), set()
+        expected = {
+            habit_id: round(due_at.timestamp(), 3)
+            for habit_id, due_at in Habit.objects.filter(next_due_at__lte=loaded_until).values_list(
+                "id", "next_due_at"
+            )
+        }
+        actual = {int(habit_id): round(score, 3) for habit_id, score in self.client.zscan_iter(self.key)}
+        missing = {habit_id for habit_id, score in expected.items() if actual.get(habit_id) != score}
+        extra = {habit_id for habit_id, score in actual.items() if expected.get(habit_id) != score}
+        return missing, extra
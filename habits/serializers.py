@@ -1,11 +1,91 @@
-from rest_framework.serializers import ModelSerializer
+from typing import Any, Optional
 
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ListSerializer, ModelSerializer
+
+from crswrk_5.metrics import timed
+from crswrk_5.serializers import PrefetchedPrimaryKeyRelatedField, SparseFieldsMixin, get_expand_fields
 from habits.models import Habit
 from habits.validators import HabitValidator
+from users.permissions import IsOwnerOrPublicReadOnly
+from users.serializers import UserPublicSerializer
+
+
+def get_habit_id(data: Any) -> Optional[int]:
+    """Возвращает id привычки из элемента пачки или None, если id не передан или не является числом"""
+    value = data.get("id") if isinstance(data, dict) else data
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class HabitListSerializer(ListSerializer):
+    """Сериализатор пачки привычек: при изменении каждый элемент проверяется поверх текущих значений привычки"""
+
+    instance: Optional[dict[int, Habit]]
 
+    @property
+    def data(self) -> Any:
+        """Отдает представление пачки и учитывает время сериализации в метриках запроса"""
+        with timed("serialize"):
+            return super().data
+
+    def to_internal_value(self, data: Any) -> list[dict[str, Any]]:
+        """Проверяет пачку целиком, ошибки возвращаются словарем по индексам элементов"""
+        self.seen_ids: set[int] = set()
+        try:
+            return super().to_internal_value(data)
+        except ValidationError as e:
+            # DRF 3.16 возвращает ошибки пачки списком, где корректным элементам соответствуют пустые словари
+            if isinstance(e.detail, list):
+                raise ValidationError({index: errors for index, errors in enumerate(e.detail) if errors})
+            raise
+
+    def run_child_validation(self, data: Any) -> dict[str, Any]:
+        """При изменении находит привычку элемента среди привычек пользователя и проверяет ее новые значения"""
+        if self.instance is None or not isinstance(data, dict):
+            return super().run_child_validation(data)
+        habit = self.instance.get(get_habit_id(data))  # type: ignore[arg-type]
+        if habit is None:
+            raise ValidationError({"id": ["Привычка не найдена"]})
+        if habit.pk in self.seen_ids:
+            raise ValidationError({"id": ["Привычка уже изменяется в этом запросе"]})
+        self.seen_ids.add(habit.pk)
+        # HabitValidator проверяет сочетание полей, поэтому недостающие поля берутся из текущей привычки
+        self.child.instance = habit
+        try:
+            attrs = self.child.run_validation({**self.child.to_representation(habit), **data, "user": habit.user_id})
+        finally:
+            self.child.instance = None
+        return {name: value for name, value in attrs.items() if name in data}
+
+
+class HabitSerializer(SparseFieldsMixin, ModelSerializer):
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+    expandable_fields = ("related_habit", "user")
 
-class HabitSerializer(ModelSerializer):
     class Meta:
         model = Habit
-        fields = "__all__"
+        exclude = ("next_due_at", "updated_at")
         validators = [HabitValidator()]
+        list_serializer_class = HabitListSerializer
+
+    def to_representation(self, instance: Habit) -> dict[str, Any]:
+        """Разворачивает связи из параметра expand во вложенные объекты, если они доступны пользователю"""
+        data = super().to_representation(instance)
+        if self.context.get("nested"):
+            return data
+        request = self.context.get("request")
+        context = {"request": request, "nested": True}
+        for name in get_expand_fields(request, self.expandable_fields):
+            related = getattr(instance, name)
+            if name not in data or related is None:
+                continue
+            if name == "user":
+                data[name] = UserPublicSerializer(related, context=context).data
+            elif IsOwnerOrPublicReadOnly().has_object_permission(request, self.context.get("view"), related):
+                data[name] = HabitSerializer(related, context=context).data
+        return data
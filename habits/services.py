@@ -1,21 +1,118 @@
 import logging
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence, Tuple
 
 import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 
-from crswrk_5.settings import TELEGRAM_TOKEN, TELEGRAM_URL
+from habits.ratelimit import TelegramRateLimiter
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class SendResult:
+    """Результат отправки одного сообщения в телеграм"""
+
+    chat_id: Any
+    ok: bool
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    retry_after: Optional[float] = None
+
+
+class TelegramSender:
+    """Отправляет сообщения в телеграм через пул keep-alive соединений и ограниченный пул потоков"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        token: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        rate_limiter: Optional[TelegramRateLimiter] = None,
+    ) -> None:
+        self.base_url = base_url or settings.TELEGRAM_URL
+        self.token = token if token is not None else settings.TELEGRAM_TOKEN
+        self.max_workers = max_workers or settings.TELEGRAM_SEND_CONCURRENCY
+        self.timeout = timeout or settings.TELEGRAM_TIMEOUT
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="telegram-sender")
+
+    @property
+    def send_url(self) -> str:
+        """Возвращает адрес метода sendMessage"""
+        return f"{self.base_url}{self.token}/sendMessage"
+
+    def send(self, chat_id: Any, message: str) -> SendResult:
+        """Отправляет одно сообщение и возвращает результат отправки"""
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.wait(chat_id)
+            if delay:
+                return SendResult(chat_id=chat_id, ok=False, error="Превышен лимит отправки", retry_after=delay)
+        params = {
+            "text": message,
+            "chat_id": chat_id,
+        }
+        try:
+            response = self.session.get(self.send_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            status_code = e.response.status_code if e.response is not None else None
+            if status_code == 429:
+                retry_after = self.get_retry_after(e.response)
+                logger.warning(f"Telegram ограничил отправку (chat_id: {chat_id}), повтор через {retry_after} с")
+                return SendResult(
+                    chat_id=chat_id, ok=False, status_code=status_code, error=str(e), retry_after=retry_after
+                )
+            logger.error(f"Ошибка при отправке сообщения в Telegram (chat_id: {chat_id}): {e}")
+            return SendResult(chat_id=chat_id, ok=False, status_code=status_code, error=str(e))
+        return SendResult(chat_id=chat_id, ok=True, status_code=response.status_code)
+
+    @staticmethod
+    def get_retry_after(response: requests.Response) -> float:
+        """Возвращает время ожидания из ответа 429: parameters.retry_after или заголовок Retry-After"""
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            pass
+        try:
+            return float(response.headers.get("Retry-After", 1))
+        except ValueError:
+            return 1.0
+
+    def send_batch(self, messages: Sequence[Tuple[Any, str]]) -> list[SendResult]:
+        """Параллельно отправляет пачку сообщений, результаты возвращаются в порядке входных пар"""
+        return list(self.executor.map(lambda item: self.send(*item), messages))
+
+    def close(self) -> None:
+        """Останавливает пул потоков и закрывает соединения"""
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+_sender: Optional[TelegramSender] = None
+
+
+def get_telegram_sender() -> TelegramSender:
+    """Возвращает отправителя, общего для процесса воркера"""
+    global _sender
+    if _sender is None:
+        _sender = TelegramSender(rate_limiter=TelegramRateLimiter())
+    return _sender
+
+
 def send_telegram_reminder(chat_id: Any, message: str) -> None:
     """Отправляет сообщение в телеграм чат"""
-    params = {
-        "text": message,
-        "chat_id": chat_id,
-    }
-    try:
-        response = requests.get(f"{TELEGRAM_URL}{TELEGRAM_TOKEN}/sendMessage", params=params, timeout=10)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка при отправке сообщения в Telegram (chat_id: {chat_id}): {e}")
+    get_telegram_sender().send(chat_id, message)
+
+
+def send_telegram_reminders(messages: Sequence[Tuple[Any, str]]) -> list[SendResult]:
+    """Отправляет пачку сообщений в телеграм, возвращает результат по каждому сообщению"""
+    return get_telegram_sender().send_batch(messages)
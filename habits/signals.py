@@ -0,0 +1,94 @@
+import logging
+from datetime import datetime
+from typing import Any, Iterable, Optional, Sequence
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from habits.cache import invalidate_habit_feeds
+from habits.feed import sync_public_feed
+from habits.models import Habit, HabitTombstone, habits_hidden, habits_rescheduled
+from habits.schedule import ReminderSchedule
+
+logger = logging.getLogger(__name__)
+
+
+def patch_reminder_schedule(entries: Iterable[tuple[int, Optional[datetime]]]) -> None:
+    """Обновляет записи привычек в расписании напоминаний, ошибки Redis исправит пересборка расписания"""
+    entries = list(entries)
+    try:
+        ReminderSchedule().sync(entries)
+    except redis.exceptions.RedisError as e:
+        habit_ids = ", ".join(str(habit_id) for habit_id, _ in entries)
+        logger.warning(f"Не удалось обновить расписание напоминаний для привычек {habit_ids}: {e}")
+
+
+def sync_saved_habits(habits: Sequence[Habit]) -> None:
+    """Переносит изменения сохраненных привычек в расписание напоминаний, общую ленту и кэш лент"""
+    if not habits:
+        return
+    if settings.REMINDERS_SCHEDULE_BACKEND == "redis":
+        # Сроки читаются при фиксации транзакции, когда они уже пересчитаны и записаны
+        transaction.on_commit(lambda: patch_reminder_schedule((habit.pk, habit.next_due_at) for habit in habits))
+    # Привычка, ставшая приватной, тоже должна пропасть из общей ленты и чужих кэшей
+    public_ids = [habit.pk for habit in habits if habit.is_public or getattr(habit, "_loaded_is_public", False)]
+    user_ids = list({habit.user_id for habit in habits})
+    transaction.on_commit(lambda: invalidate_habit_feeds(user_ids, public=bool(public_ids)))
+    if public_ids:
+        transaction.on_commit(lambda: sync_public_feed(public_ids))
+
+
+@receiver(post_save, sender=Habit)
+def habit_saved(sender: Any, instance: Habit, **kwargs: Any) -> None:
+    """Переносит изменения привычки в расписание напоминаний, общую ленту и кэш лент"""
+    if getattr(instance, "_loaded_is_public", False) and not instance.is_public:
+        HabitTombstone.hidden(instance.pk, instance.user_id, instance.updated_at).save()
+    sync_saved_habits([instance])
+
+
+@receiver(habits_hidden, sender=Habit)
+def habits_hidden_by_update(sender: Any, hidden: list[tuple[int, int]], **kwargs: Any) -> None:
+    """Убирает скрытые через update() привычки из общей ленты и сбрасывает кэш лент"""
+    habit_ids = [habit_id for habit_id, _ in hidden]
+    user_ids = list({user_id for _, user_id in hidden})
+    transaction.on_commit(lambda: invalidate_habit_feeds(user_ids, public=True))
+    transaction.on_commit(lambda: sync_public_feed(habit_ids))
+
+
+@receiver(habits_rescheduled, sender=Habit)
+def habits_rescheduled_by_update(sender: Any, habit_ids: list[int], **kwargs: Any) -> None:
+    """Переносит в расписание напоминаний сроки привычек, пересчитанные через update()"""
+    if settings.REMINDERS_SCHEDULE_BACKEND == "redis":
+        transaction.on_commit(
+            lambda: patch_reminder_schedule(Habit.objects.filter(pk__in=habit_ids).values_list("id", "next_due_at"))
+        )
+
+
+@receiver(pre_delete, sender=Habit)
+def habit_deleting(sender: Any, instance: Habit, **kwargs: Any) -> None:
+    """Отмечает изменение привычек, которые ссылаются на удаляемую и потеряют связь с ней, обновляет их кэш и ленту"""
+    dependants = list(Habit.objects.filter(related_habit=instance).values_list("pk", "user_id", "is_public"))
+    if dependants:
+        Habit.objects.filter(pk__in=[pk for pk, _, _ in dependants]).update(updated_at=timezone.now())
+        if settings.HABITS_FEED_CACHE_ENABLED or settings.HABITS_PUBLIC_FEED_ENABLED:
+            user_ids = [user_id for _, user_id, _ in dependants]
+            public_ids = [pk for pk, _, is_public in dependants if is_public]
+            transaction.on_commit(lambda: invalidate_habit_feeds(user_ids, public=bool(public_ids)))
+            if public_ids:
+                transaction.on_commit(lambda: sync_public_feed(public_ids))
+
+
+@receiver(post_delete, sender=Habit)
+def habit_deleted(sender: Any, instance: Habit, **kwargs: Any) -> None:
+    """Оставляет отметку об удалении привычки, убирает ее из расписания и общей ленты, сбрасывает кэш лент"""
+    habit_id, user_id, public = instance.pk, instance.user_id, instance.is_public
+    HabitTombstone.objects.create(habit_id=habit_id, owner_id=user_id, is_public=public)
+    if settings.REMINDERS_SCHEDULE_BACKEND == "redis":
+        transaction.on_commit(lambda: patch_reminder_schedule([(habit_id, None)]))
+    transaction.on_commit(lambda: invalidate_habit_feeds([user_id], public=public))
+    if public:
+        transaction.on_commit(lambda: sync_public_feed([habit_id]))
@@ -0,0 +1,109 @@
+import heapq
+import json
+from base64 import b64decode, b64encode
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from habits.models import Habit, HabitTombstone
+from users.models import User
+
+# Позиция в потоке изменений: время изменения, вид записи и ее id. При равном времени изменения привычек идут
+# раньше отметок об удалении, поэтому скрытие привычки в том же запросе, что и ее изменение, применяется последним
+SYNC_HABIT, SYNC_TOMBSTONE = 0, 1
+SyncPosition = tuple[datetime, int, int]
+
+SYNC_QUERY_PARAM = "since"
+
+
+@dataclass
+class SyncPage:
+    """Страница дельта-синхронизации: измененные привычки, id удаленных и скрытых, позиция продолжения"""
+
+    changed: list[dict[str, Any]]
+    deleted: list[int]
+    position: SyncPosition
+    has_more: bool
+    reset: bool
+
+
+def encode_sync_token(position: SyncPosition) -> str:
+    """Кодирует позицию в потоке изменений в непрозрачный токен"""
+    changed_at, kind, pk = position
+    return b64encode(json.dumps([changed_at.isoformat(), kind, pk]).encode()).decode()
+
+
+def decode_sync_token(token: Optional[str]) -> Optional[SyncPosition]:
+    """Разбирает токен синхронизации, для пустого токена возвращает None (полная синхронизация)"""
+    if not token:
+        return None
+    try:
+        changed_at, kind, pk = json.loads(b64decode(token.encode(), validate=True).decode())
+        position = (datetime.fromisoformat(changed_at), int(kind), int(pk))
+    except (ValueError, TypeError):
+        raise ValidationError({SYNC_QUERY_PARAM: ["Некорректный токен синхронизации"]})
+    if timezone.is_naive(position[0]):
+        raise ValidationError({SYNC_QUERY_PARAM: ["Некорректный токен синхронизации"]})
+    return position
+
+
+def get_after_position_filter(field: str, kind: int, position: Optional[SyncPosition]) -> Q:
+    """Возвращает условие (field, kind, id) > позиции для записей одного вида"""
+    if position is None:
+        return Q()
+    changed_at, position_kind, pk = position
+    condition = Q(**{f"{field}__gt": changed_at})
+    if kind > position_kind:
+        condition |= Q(**{field: changed_at})
+    elif kind == position_kind:
+        condition |= Q(**{field: changed_at, "id__gt": pk})
+    return condition
+
+
+def get_sync_page(
+    user: User, token: Optional[str], values: Callable[[QuerySet], QuerySet], limit: Optional[int] = None
+) -> SyncPage:
+    """Возвращает изменения ленты пользователя после позиции токена в порядке их времени"""
+    limit = limit or settings.HABITS_SYNC_PAGE_SIZE
+    current = timezone.now()
+    position = decode_sync_token(token)
+    reset = position is not None and position[0] < current - timedelta(days=settings.HABITS_SYNC_TOMBSTONE_DAYS)
+    if reset:
+        position = None
+    habits = values(
+        Habit.objects.feed_for(user)
+        .filter(get_after_position_filter("updated_at", SYNC_HABIT, position))
+        .order_by("updated_at", "id")
+    )[: limit + 1]
+    # При полной синхронизации отметки не нужны: клиент заменяет свою копию ленты целиком
+    tombstones = (
+        HabitTombstone.objects.visible_to(user)
+        .filter(get_after_position_filter("created_at", SYNC_TOMBSTONE, position))
+        .order_by("created_at", "id")
+        .values_list("created_at", "id", "habit_id")[: limit + 1]
+        if position is not None
+        else []
+    )
+    merged = list(
+        heapq.merge(
+            (((row["updated_at"], SYNC_HABIT, row["id"]), row) for row in habits),
+            (((created_at, SYNC_TOMBSTONE, pk), habit_id) for created_at, pk, habit_id in tombstones),
+            key=lambda item: item[0],
+        )
+    )
+    page = merged[:limit]
+    changed = [row for _, row in page if isinstance(row, dict)]
+    changed_ids = {row["id"] for row in changed}
+    deleted = list(dict.fromkeys(pk for _, pk in page if not isinstance(pk, dict) and pk not in changed_ids))
+    # Изменения последних секунд отдаются повторно при следующей синхронизации: транзакции, начатые раньше
+    # конца страницы, могут закоммитить изменения с более ранним временем уже после ответа. Страница, дошедшая
+    # до этого окна, завершает обход, иначе клиент запрашивал бы одно и то же окно, пока оно не сдвинется
+    floor = (current - timedelta(seconds=settings.HABITS_SYNC_LAG_SECONDS), SYNC_HABIT, 0)
+    next_position = min(page[-1][0], floor) if page else floor
+    has_more = len(merged) > limit and next_position < floor
+    return SyncPage(changed, deleted, next_position, has_more, reset)
@@ -1,20 +1,217 @@
-from celery import shared_task
+import logging
+import math
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Optional, Sequence
+
+from celery import group, shared_task
+from django.conf import settings
+from django.db import transaction
 from django.utils.timezone import now
 
-from habits.models import Habit
-from habits.services import send_telegram_reminder
+from habits.models import Habit, HabitTombstone, ReminderOutbox, ReminderWatermark
+from habits.schedule import ReminderSchedule
+from habits.services import SendResult, send_telegram_reminders
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "habits_reminders"
+
+# Ошибки Telegram, после которых повтор бессмысленен: неверный запрос, бот заблокирован, чат не найден
+PERMANENT_ERROR_CODES = (400, 401, 403, 404)
+
+# Максимальная длина текста сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+@shared_task
+def send_habits_reminders() -> dict[str, int]:
+    """Ставит в очередь напоминания о привычках, срок которых наступил, и сдвигает их сроки на период"""
+    current = now().replace(second=0, microsecond=0)
+    lookahead = timedelta(minutes=settings.REMINDERS_LOOKAHEAD_MINUTES)
+    horizon = current + lookahead
+    schedule = None
+    popped: list[tuple[int, datetime]] = []
+    if settings.REMINDERS_SCHEDULE_BACKEND == "redis":
+        schedule = ReminderSchedule()
+        loaded_until = schedule.get_loaded_until()
+        if loaded_until is None or loaded_until < horizon:
+            schedule.load(current)
+        popped = schedule.pop_due(horizon)
+        if not popped:
+            return get_tick_metrics(0, 0)
+    habit_ids = [habit_id for habit_id, _ in popped]
+    try:
+        with transaction.atomic():
+            # Строка отметки только сериализует пересекающиеся тики: отправленное уже сдвинуто по next_due_at
+            ReminderWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+            due = Habit.objects.filter(next_due_at__lte=horizon)
+            if schedule is not None:
+                due = due.filter(pk__in=habit_ids)
+            rows = (
+                due.filter(
+                    next_due_at__gt=current - timedelta(minutes=settings.REMINDERS_MAX_CATCHUP_MINUTES),
+                    user__tg_chat_id__isnull=False,
+                )
+                .exclude(user__tg_chat_id="")
+                .order_by("user__tg_chat_id", "next_due_at", "time", "id")
+                .values_list("user__tg_chat_id", "next_due_at", "action", "place")
+            )
+            habits_count = 0
+            reminders = []
+            for (chat_id, slot), chat_rows in groupby(rows, key=lambda row: (row[0], max(row[1], current))):
+                habits = [(action, place) for *_, action, place in chat_rows]
+                habits_count += len(habits)
+                options = {"next_attempt_at": get_delivery_time(chat_id, slot)} if lookahead else {}
+                reminders.extend(
+                    ReminderOutbox(chat_id=chat_id, message=message, **options)
+                    for message in render_reminder_digests(habits)
+                )
+            created = ReminderOutbox.objects.bulk_create(reminders)
+            due.advance_next_due_at(horizon)
+    except Exception:
+        if schedule is not None:
+            schedule.add(popped)
+        raise
+    if schedule is not None:
+        reschedule_habits(schedule, habit_ids)
+    if lookahead:
+        for eta, count in Counter(reminder.next_attempt_at for reminder in created).items():
+            dispatch_drainers(count, eta=eta)
+    else:
+        dispatch_drainers(len(created))
+    metrics = get_tick_metrics(habits_count, len(created))
+    logger.info(f"Тик напоминаний: {metrics}")
+    return metrics
+
+
+def get_delivery_time(chat_id: str, slot: datetime) -> datetime:
+    """Возвращает момент отправки в минуте slot: чаты равномерно и стабильно распределены по секундам"""
+    if not settings.REMINDERS_SPREAD_SECONDS:
+        return slot
+    return slot + timedelta(seconds=zlib.crc32(chat_id.encode()) % settings.REMINDERS_SPREAD_SECONDS)
+
+
+def dispatch_drainers(reminders_count: int, eta: Optional[datetime] = None) -> None:
+    """Запускает столько задач разбора очереди, сколько пачек в reminders_count, не раньше eta"""
+    drainers = math.ceil(reminders_count / settings.REMINDERS_CHUNK_SIZE)
+    if drainers:
+        group(drain_reminder_outbox.s() for _ in range(drainers)).apply_async(eta=eta)
+
+
+def render_reminder_digests(habits: Sequence[tuple[str, str]]) -> list[str]:
+    """Собирает напоминания одного чата в сводку, разбивая ее на сообщения не длиннее лимита Telegram"""
+    if len(habits) == 1:
+        action, place = habits[0]
+        return [f"Выполните привычку: {action}\nМесто: {place}"]
+    header = "Выполните привычки:"
+    messages = []
+    lines = [header]
+    length = len(header)
+    for action, place in habits:
+        line = f"— {action} (место: {place})"
+        if len(lines) > 1 and length + 1 + len(line) > TELEGRAM_MESSAGE_LIMIT:
+            messages.append("\n".join(lines))
+            lines = [header]
+            length = len(header)
+        lines.append(line)
+        length += 1 + len(line)
+    messages.append("\n".join(lines))
+    return messages
+
+
+def get_tick_metrics(habits_count: int, messages_count: int) -> dict[str, int]:
+    """Возвращает метрики тика: сколько привычек напомнено, сколько сообщений и HTTP-запросов сэкономлено"""
+    return {"habits": habits_count, "messages": messages_count, "saved_requests": habits_count - messages_count}
+
+
+def reschedule_habits(schedule: ReminderSchedule, habit_ids: list[int]) -> None:
+    """Возвращает в расписание привычки, новый срок которых попадает в уже загруженное окно"""
+    loaded_until = schedule.get_loaded_until()
+    if loaded_until is None:
+        return
+    schedule.add(
+        Habit.objects.filter(pk__in=habit_ids, next_due_at__lte=loaded_until).values_list("id", "next_due_at")
+    )
+
+
+@shared_task
+def load_reminder_schedule() -> int:
+    """Догружает в Redis расписание напоминаний на следующие часы"""
+    if settings.REMINDERS_SCHEDULE_BACKEND != "redis":
+        return 0
+    added = ReminderSchedule().load(now())
+    logger.info(f"В расписание напоминаний добавлено привычек: {added}")
+    return added
+
+
+@shared_task
+def purge_habit_tombstones() -> int:
+    """Удаляет отметки об удалении привычек старше срока хранения, клиенты со старым токеном синхронизируются заново"""
+    until = now() - timedelta(days=settings.HABITS_SYNC_TOMBSTONE_DAYS)
+    deleted, _ = HabitTombstone.objects.filter(created_at__lt=until).delete()
+    logger.info(f"Удалено отметок об удалении привычек: {deleted}")
+    return deleted
 
 
 @shared_task
-def send_habits_reminders() -> None:
-    """Отправляет пользователю напоминание о выполнении привычки в телеграм"""
-    current_time = now().time()
-    habits = Habit.objects.filter(time__hour=current_time.hour, time__minute=current_time.minute).select_related(
-        "user"
+def drain_reminder_outbox() -> int:
+    """Разбирает очередь напоминаний пачками, пока в ней есть готовые к отправке сообщения"""
+    processed = 0
+    while True:
+        batch_size = drain_reminder_outbox_batch()
+        if not batch_size:
+            return processed
+        processed += batch_size
+
+
+def drain_reminder_outbox_batch() -> int:
+    """Забирает пачку готовых напоминаний в аренду, отправляет их вне транзакции и сохраняет результат"""
+    batch = claim_reminder_outbox_batch()
+    if not batch:
+        return 0
+    results = send_telegram_reminders([(reminder.chat_id, reminder.message) for reminder in batch])
+    sent_at = now()
+    for reminder, result in zip(batch, results):
+        apply_send_result(reminder, result, sent_at)
+    ReminderOutbox.objects.bulk_update(batch, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"])
+    return len(batch)
+
+
+@transaction.atomic
+def claim_reminder_outbox_batch() -> list[ReminderOutbox]:
+    """Блокирует пачку готовых напоминаний через SKIP LOCKED и откладывает их попытку на срок аренды"""
+    batch = list(
+        ReminderOutbox.objects.select_for_update(skip_locked=True)
+        .filter(status=ReminderOutbox.Status.PENDING, next_attempt_at__lte=now())
+        .order_by("next_attempt_at")[: settings.REMINDERS_CHUNK_SIZE]
+    )
+    # Блокировки снимаются сразу, а другие воркеры не возьмут пачку до конца аренды: она должна быть дольше
+    # отправки пачки с учетом лимитов Telegram. Если воркер упадет, напоминания отправятся после ее окончания
+    leased_until = now() + timedelta(seconds=settings.REMINDERS_OUTBOX_LEASE_SECONDS)
+    ReminderOutbox.objects.filter(pk__in=[reminder.pk for reminder in batch]).update(next_attempt_at=leased_until)
+    return batch
+
+
+def apply_send_result(reminder: ReminderOutbox, result: SendResult, sent_at: datetime) -> None:
+    """Переводит напоминание в новое состояние по результату отправки"""
+    if result.ok:
+        reminder.status = ReminderOutbox.Status.DELIVERED
+        reminder.sent_at = sent_at
+        reminder.last_error = ""
+        return
+    reminder.last_error = result.error or ""
+    if result.retry_after is not None:
+        reminder.next_attempt_at = sent_at + timedelta(seconds=result.retry_after)
+        return
+    reminder.attempts += 1
+    if result.status_code in PERMANENT_ERROR_CODES or reminder.attempts >= settings.REMINDERS_MAX_RETRIES:
+        reminder.status = ReminderOutbox.Status.FAILED
+        logger.error(f"Напоминание {reminder.pk} не доставлено после {reminder.attempts} попыток: {result.error}")
+        return
+    backoff = min(
+        settings.REMINDERS_RETRY_BACKOFF * 2 ** (reminder.attempts - 1), settings.REMINDERS_RETRY_BACKOFF_MAX
     )
-    for habit in habits:
-        user = habit.user
-        if not user.tg_chat_id:
-            continue
-        message = f"Выполните привычку: {habit.action}\n" f"Место: {habit.place}"
-        send_telegram_reminder(user.tg_chat_id, message)
+    reminder.next_attempt_at = sent_at + timedelta(seconds=backoff)
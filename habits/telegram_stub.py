@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов заглушки, отвечает как метод sendMessage Telegram Bot API"""
+
+    protocol_version = "HTTP/1.1"
+    server: "TelegramStubServer"
+
+    def setup(self) -> None:
+        """Учитывает новое TCP-соединение"""
+        super().setup()
+        self.server.register_connection()
+
+    def do_GET(self) -> None:
+        """Принимает сообщение из параметров запроса"""
+        self._handle(dict(parse_qsl(urlsplit(self.path).query)))
+
+    def do_POST(self) -> None:
+        """Принимает сообщение из тела запроса"""
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode()
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(body or "{}")
+        else:
+            params = dict(parse_qsl(body))
+        self._handle(params)
+
+    def _handle(self, params: dict[str, Any]) -> None:
+        """Имитирует задержку Telegram и записывает принятое сообщение"""
+        if not urlsplit(self.path).path.endswith("/sendMessage"):
+            self._respond(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not self.server.allow(params.get("chat_id")):
+            retry_after = self.server.retry_after
+            self._respond(
+                429,
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                },
+            )
+            return
+        message_id = self.server.record(params)
+        self._respond(200, {"ok": True, "result": {"message_id": message_id, "chat": {"id": params.get("chat_id")}}})
+
+    def _respond(self, status: int, payload: dict[str, Any]) -> None:
+        """Отправляет JSON-ответ, не закрывая соединение"""
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Отключает вывод каждого запроса в stderr"""
+
+
+class TelegramStubServer(ThreadingHTTPServer):
+    """Локальная заглушка Telegram Bot API для офлайн-тестов и замеров пропускной способности"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        global_rate: Optional[float] = None,
+        chat_rate: Optional[float] = None,
+        retry_after: int = 1,
+    ) -> None:
+        super().__init__((host, port), TelegramStubHandler)
+        self.latency = latency
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.retry_after = retry_after
+        self.messages: list[dict[str, Any]] = []
+        self.connections = 0
+        self.rejected = 0
+        self._sent_at: deque[float] = deque()
+        self._chat_sent_at: dict[Any, float] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Возвращает адрес, который подставляется вместо TELEGRAM_URL"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def register_connection(self) -> None:
+        """Увеличивает счетчик принятых соединений"""
+        with self._lock:
+            self.connections += 1
+
+    def allow(self, chat_id: Any) -> bool:
+        """Имитирует лимиты Telegram: не больше global_rate сообщений в секунду и chat_rate в чат"""
+        now = time.monotonic()
+        with self._lock:
+            while self._sent_at and now - self._sent_at[0] >= 1:
+                self._sent_at.popleft()
+            chat_sent_at = self._chat_sent_at.get(chat_id)
+            if (self.global_rate and len(self._sent_at) >= self.global_rate) or (
+                self.chat_rate and chat_sent_at is not None and now - chat_sent_at < 1 / self.chat_rate
+            ):
+                self.rejected += 1
+                return False
+            self._sent_at.append(now)
+            self._chat_sent_at[chat_id] = now
+            return True
+
+    def record(self, params: dict[str, Any]) -> int:
+        """Сохраняет сообщение и возвращает его номер"""
+        with self._lock:
+            self.messages.append(params)
+            return len(self.messages)
+
+    def start(self) -> "TelegramStubServer":
+        """Запускает сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Останавливает сервер и освобождает порт"""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "TelegramStubServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
@@ -1,17 +1,52 @@
-from datetime import datetime, time
-from typing import Any
+import json
+import logging
+import logging.config
+import runpy
+import threading
+import zlib
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from typing import Any, Iterator
 from unittest.mock import Mock, patch
 
+import fakeredis
 import pytest
 import requests
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.serializers import ValidationError
 from rest_framework.test import APIClient, APITestCase
 
-from habits.models import Habit
-from habits.services import send_telegram_reminder
-from habits.tasks import send_habits_reminders
+from crswrk_5.celery import app as celery_app
+from crswrk_5.middleware import RequestMetricsMiddleware
+from crswrk_5.renderers import ORJSONRenderer
+from habits.cache import HabitFeedCache
+from habits.feed import PublicHabitFeed
+from habits.models import Habit, HabitTombstone, ReminderOutbox, ReminderWatermark, get_next_due_at
+from habits.pagination import HabitCursorPagination
+from habits.ratelimit import TelegramRateLimiter
+from habits.schedule import ReminderSchedule
+from habits.serializers import HabitSerializer
+from habits.services import SendResult, TelegramSender, send_telegram_reminder
+from habits.sync import SYNC_HABIT, encode_sync_token
+from habits.tasks import (
+    TELEGRAM_MESSAGE_LIMIT,
+    WATERMARK_NAME,
+    drain_reminder_outbox,
+    drain_reminder_outbox_batch,
+    render_reminder_digests,
+    send_habits_reminders,
+)
+from habits.telegram_stub import TelegramStubServer
 from habits.validators import HabitValidator
 from users.models import User
 
@@ -91,6 +126,103 @@ class HabitTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(data["action"], self.habit.action)
 
+    def test_fast_read_path_matches_serializer(self) -> None:
+        """Тестирует, что список и детали из строк .values() совпадают с выводом HabitSerializer"""
+        expected = json.loads(JSONRenderer().render(HabitSerializer(self.habit).data))
+        detail = self.client.get(reverse("habits:habit-retrieve", args=(self.habit.id,))).json()
+        page = self.client.get(reverse("habits:habits-list")).json()
+        self.assertEqual(detail, expected)
+        self.assertEqual(page["results"], [expected])
+
+    def test_orjson_renderer_matches_json_renderer(self) -> None:
+        """Тестирует, что orjson-рендерер выводит даты, время и Decimal так же, как стандартный JSONRenderer"""
+        data = {
+            "created_at": datetime(2026, 1, 2, 3, 4, 5, 678, tzinfo=dt_timezone.utc),
+            "time": time(8, 30, 15),
+            "amount": Decimal("1.50"),
+            "label": gettext_lazy("Привычка"),
+            "items": [1, None, True],
+        }
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    def test_invalid_json_returns_400(self) -> None:
+        """Тестирует, что некорректный JSON в теле запроса отклоняется с кодом 400"""
+        url = reverse("habits:habit-create")
+        response = self.client.post(url, data=b"{not json", content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_fields(self) -> None:
+        """Тестирует, что fields и exclude сужают ответ и выборку из базы, а неизвестные поля отклоняются"""
+        list_url = reverse("habits:habits-list")
+        detail_url = reverse("habits:habit-retrieve", args=(self.habit.id,))
+        with CaptureQueriesContext(connection) as queries:
+            page = self.client.get(f"{list_url}?fields=id,action,time,place").json()
+        self.assertEqual(set(page["results"][0]), {"id", "action", "time", "place"})
+        self.assertFalse(any('"reward"' in query["sql"] for query in queries.captured_queries))
+        detail = self.client.get(f"{detail_url}?exclude=reward,related_habit,duration").json()
+        self.assertNotIn("reward", detail)
+        self.assertEqual(detail["action"], self.habit.action)
+        cursor_page = self.client.get(f"{list_url}?cursor=&fields=id").json()
+        self.assertEqual(cursor_page["results"], [{"id": self.habit.id}])
+        response = self.client.get(f"{list_url}?fields=id,next_due_at")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("next_due_at", response.json()["fields"][0])
+
+    def test_expand_related(self) -> None:
+        """Тестирует, что expand разворачивает связи одним запросом и не раскрывает чужие приватные привычки"""
+        other = User.objects.create(email="other-expand@example.com", town="Тула")
+        public_related = Habit.objects.create(
+            user=other, place="Дом", time=time(7, 0), action="Чай", duration=60, is_pleasant=True, is_public=True
+        )
+        private_related = Habit.objects.create(
+            user=other, place="Дом", time=time(7, 0), action="Кофе", duration=60, is_pleasant=True
+        )
+        self.habit.related_habit = public_related
+        self.habit.save()
+        hidden = Habit.objects.create(
+            user=self.user, place="Сад", time=time(23, 0), action="Полив", duration=60, related_habit=private_related
+        )
+        list_url = reverse("habits:habits-list")
+        with self.assertNumQueries(1):
+            page = self.client.get(f"{list_url}?cursor=&page_size=10&expand=related_habit,user").json()
+        rows = {row["id"]: row for row in page["results"]}
+        self.assertEqual(rows[self.habit.id]["related_habit"]["action"], "Чай")
+        self.assertEqual(rows[self.habit.id]["user"], {"id": self.user.id, "town": None, "avatar": None})
+        self.assertEqual(rows[public_related.id]["user"]["town"], "Тула")
+        self.assertEqual(rows[hidden.id]["related_habit"], private_related.id)
+
+        detail_url = reverse("habits:habit-retrieve", args=(self.habit.id,))
+        with self.assertNumQueries(1):
+            detail = self.client.get(f"{detail_url}?expand=related_habit&fields=id,related_habit").json()
+        self.assertEqual(detail["related_habit"]["id"], public_related.id)
+        self.assertEqual(set(detail), {"id", "related_habit"})
+        self.assertEqual(set(detail["related_habit"]), set(rows[public_related.id]))
+        response = self.client.get(f"{detail_url}?expand=next_due_at")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_habit_etag(self) -> None:
+        """Тестирует, что If-None-Match получает 304 за один запрос версии, а If-Match защищает от перезаписи"""
+        detail_url = reverse("habits:habit-retrieve", args=(self.habit.id,))
+        update_url = reverse("habits:habit-update", args=(self.habit.id,))
+        etag = self.client.get(detail_url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(self.client.get(f"{detail_url}?fields=id")["ETag"], etag)
+
+        data = {"place": "Лес", "reward": self.habit.reward, "duration": 60, "periodicity": 1}
+        response = self.client.patch(update_url, data, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_etag = response["ETag"]
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(detail_url)["ETag"], new_etag)
+
+        response = self.client.patch(update_url, {**data, "place": "Сад"}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        delete_url = reverse("habits:habit-delete", args=(self.habit.id,))
+        self.assertEqual(self.client.delete(delete_url, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(self.client.delete(delete_url, HTTP_IF_MATCH=new_etag).status_code, 204)
+
     def test_habit_update(self) -> None:
         """Тестирует редактирование привычки"""
         url = reverse("habits:habit-update", args=(self.habit.id,))
@@ -112,7 +244,7 @@ class HabitTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Habit.objects.all().count(), 0)
 
-    @patch("habits.services.requests.get")
+    @patch("habits.services.requests.Session.get")
     def test_send_telegram_reminder_success(self, mock_get: Mock) -> None:
         """Тестирует успешную отправку напоминания"""
         mock_response = Mock()
@@ -123,12 +255,78 @@ class HabitTestCase(APITestCase):
 
         mock_get.assert_called_once()
 
-    def test_send_habits_reminders_task(self) -> None:
+    @patch("habits.tasks.now")
+    @patch("habits.tasks.send_telegram_reminders")
+    def test_send_habits_reminders_task(self, mock_send: Mock, mock_now: Mock) -> None:
         """Покрытие Celery таска send_habits_reminders"""
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", False)
+        tick = timezone.now() + timedelta(minutes=1)
+        mock_now.return_value = tick
+        mock_send.return_value = [SendResult("123", True, 200)]
+        self.user.tg_chat_id = "123"
+        self.user.save()
+        self.habit.time = tick.time()
+        self.habit.save()
+        Habit.objects.create(
+            action="Чтение",
+            user=self.user,
+            place="Дом",
+            time=(tick + timedelta(minutes=5)).time(),
+            duration=60,
+            reward="Чай",
+        )
+
+        send_habits_reminders()
+
+        message = f"Выполните привычку: {self.habit.action}\nМесто: {self.habit.place}"
+        mock_send.assert_called_once_with([("123", message)])
+        reminder = ReminderOutbox.objects.get()
+        self.assertEqual((reminder.message, reminder.status), (message, ReminderOutbox.Status.DELIVERED))
+
+    def test_next_due_at_synced_on_save(self) -> None:
+        """Тестирует пересчет срока напоминания при изменении времени привычки"""
+        started = timezone.now()
+        self.habit.time = time(8, 30)
+        self.habit.save(update_fields=["time"])
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.next_due_at, get_next_due_at(time(8, 30), started))
+
+        due_at = self.habit.next_due_at
+        self.habit.place = "Лес"
+        self.habit.save()
+        self.assertEqual(self.habit.next_due_at, due_at)
+
+        # Срок со сдвигом на период не должен сбрасываться при сохранении привычки с отложенным расписанием
+        Habit.objects.filter(pk=self.habit.pk).update(next_due_at=due_at + timedelta(days=2))
+        habit = Habit.objects.only("id", "place", "next_due_at").get(pk=self.habit.pk)
+        habit.place = "Парк"
+        habit.save(update_fields=["place"])
+        self.assertEqual(Habit.objects.get(pk=self.habit.pk).next_due_at, due_at + timedelta(days=2))
+
+    def test_next_due_at_synced_on_bulk_operations(self) -> None:
+        """Тестирует пересчет срока напоминания при массовых операциях"""
+        created = Habit.objects.bulk_create(
+            [Habit(action="Бег", user=self.user, place="Стадион", time=time(7, 15), duration=60, reward="Душ")]
+        )
+        self.assertIsNotNone(created[0].next_due_at)
+        created[0].time = time(23, 59)
+        Habit.objects.bulk_update(created, ["time"])
+        self.assertEqual(Habit.objects.get(pk=created[0].pk).next_due_at.time(), time(23, 59))
+
+        Habit.objects.filter(pk=self.habit.pk).update(time=time(0, 1))
+        self.assertEqual(Habit.objects.get(pk=self.habit.pk).next_due_at.time(), time(0, 1))
 
-    send_habits_reminders()
+        Habit.objects.filter(pk=self.habit.pk).update(time=F("time"), periodicity=2)
+        self.assertEqual(Habit.objects.get(pk=self.habit.pk).next_due_at.time(), time(0, 1))
 
-    @patch("habits.services.requests.get")
+    def test_get_next_due_at(self) -> None:
+        """Тестирует выбор ближайшего срока: сегодня, если время еще не наступило, иначе завтра"""
+        after = timezone.now().replace(hour=8, minute=0, second=30, microsecond=0)
+        self.assertEqual(get_next_due_at(time(9, 0), after), after.replace(hour=9, second=0))
+        self.assertEqual(get_next_due_at(time(8, 0), after), after.replace(second=0) + timedelta(days=1))
+
+    @patch("habits.services.requests.Session.get")
     @patch("habits.services.logger")
     def test_send_telegram_reminder_error(self, mock_logger: Mock, mock_get: Mock) -> None:
         """Тестирует вызов ошибок при отправке телеграм напоминания"""
@@ -170,6 +368,30 @@ class HabitTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_ownership_checked_without_loading_user(self) -> None:
+        """Тестирует, что права на привычку проверяются по user_id, без запроса владельца"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("habits:habit-retrieve", args=(self.habit.id,)))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = {"place": "Лес", "reward": self.habit.reward, "duration": 60, "periodicity": 1}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(reverse("habits:habit-update", args=(self.habit.id,)), data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.delete(reverse("habits:habit-delete", args=(self.habit.id,)))
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse([query for query in queries.captured_queries if 'FROM "users_user"' in query["sql"]])
+
+        other_user = User.objects.create(email="other@test.com")
+        other_habit = Habit.objects.create(
+            user=other_user, action="Бег", place="Парк", time=time(7, 0), duration=60, reward="Душ"
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(reverse("habits:habit-update", args=(other_habit.id,)), data)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        selects = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+
     def test_other_user_can_view_public_habit(self) -> None:
         """Тестирует возможность просматривать чужие публичные привычки"""
         other_user = User.objects.create(email="other@test.com")
@@ -346,3 +568,971 @@ class TestHabitPagination:
 
         assert response.status_code == 200
         assert len(response.data["results"]) == 10
+
+    def test_cursor_pages(self) -> None:
+        """Тестирует обход ленты курсором по (time, id) вперед и назад без подсчета общего количества"""
+        Habit.objects.create(user=self.user, action="Раньше", duration=60, time=time(8, 0))
+        expected = list(Habit.objects.order_by("time", "id").values_list("id", flat=True))
+
+        seen: list[int] = []
+        url = f"{self.url}?cursor="
+        while url:
+            response = self.client.get(url)
+            assert response.status_code == 200
+            assert "count" not in response.data
+            seen.extend(habit["id"] for habit in response.data["results"])
+            last_page, url = response.data, response.data["next"]
+
+        assert seen == expected
+        previous = self.client.get(last_page["previous"]).data
+        assert [habit["id"] for habit in previous["results"]] == expected[5:10]
+
+    def test_invalid_cursor(self) -> None:
+        """Тестирует ответ на испорченный курсор"""
+        response = self.client.get(f"{self.url}?cursor=broken")
+
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestHabitFeedPlan:
+    """Тестирование плана запроса ленты привычек"""
+
+    def setup_method(self) -> None:
+        """Наполняет таблицу привычками разных пользователей с редкими публичными привычками"""
+        users = User.objects.bulk_create(User(email=f"feed{i}@test.com") for i in range(1000))
+        Habit.objects.bulk_create(
+            Habit(
+                user=users[i % len(users)],
+                action="Зарядка",
+                place="Дом",
+                time=time(i % 24, i % 60),
+                duration=60,
+                is_public=i % 1000 == 0,
+            )
+            for i in range(20_000)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE habits_habit")
+        self.user = users[0]
+
+    def test_feed_page_uses_feed_indexes(self) -> None:
+        """Тестирует, что страница ленты читается по составному и частичному индексам без полного сканирования"""
+        pagination = HabitCursorPagination()
+        pagination.is_reverse = False
+        position_filter = pagination.get_position_filter(Habit, [time(12, 0), 0])
+        queryset = Habit.objects.feed_for(self.user).filter(position_filter).order_by("time", "id")
+
+        first_page_plan = Habit.objects.feed_for(self.user).order_by("time", "id")[:6].explain()
+        plan = queryset[:6].explain()
+
+        for page_plan in (first_page_plan, plan):
+            assert "habits_habit_user_time_idx" in page_plan
+            assert "habits_habit_public_time_idx" in page_plan
+            assert "Seq Scan" not in page_plan
+
+
+@pytest.mark.django_db
+class TestHabitFeedCache:
+    """Тестирование кэша ленты привычек"""
+
+    def setup_method(self) -> None:
+        """Подменяет Redis кэша и создает двух пользователей с привычками"""
+        self.redis = fakeredis.FakeRedis()
+        self.patcher = patch("habits.cache.get_redis_client", return_value=self.redis)
+        self.patcher.start()
+        self.owner = User.objects.create(email="feed-owner@test.com")
+        self.reader = User.objects.create(email="feed-reader@test.com")
+        self.habit = self.create_habit(self.owner, is_public=False)
+        self.create_habit(self.reader, is_public=True)
+        self.url = reverse("habits:habits-list")
+
+    def teardown_method(self) -> None:
+        """Снимает подмену Redis"""
+        self.patcher.stop()
+
+    def create_habit(self, user: User, is_public: bool) -> Habit:
+        """Создает привычку пользователя"""
+        return Habit.objects.create(
+            user=user, action="Зарядка", place="Дом", time=time(9, 0), duration=60, reward="Чай", is_public=is_public
+        )
+
+    def get_feed(self, user: User) -> Any:
+        """Запрашивает ленту от имени пользователя"""
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client.get(self.url)
+
+    def test_repeated_request_served_without_sql(self, django_assert_num_queries: Any) -> None:
+        """Тестирует, что повторный запрос ленты отдается из кэша без запросов к базе"""
+        first = self.get_feed(self.owner)
+
+        with django_assert_num_queries(0):
+            second = self.get_feed(self.owner)
+
+        assert second.status_code == 200
+        assert second.json() == first.json()
+        assert HabitFeedCache(client=self.redis).get_stats() == {"hits": 1, "misses": 1}
+
+    def test_conditional_request_served_without_reading_page(
+        self, django_assert_num_queries: Any, django_capture_on_commit_callbacks: Any
+    ) -> None:
+        """Тестирует, что совпавший If-None-Match получает 304 по версиям ленты без чтения страницы и базы"""
+        client = APIClient()
+        client.force_authenticate(user=self.owner)
+        etag = client.get(self.url)["ETag"]
+        with django_assert_num_queries(0):
+            response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304 and response["ETag"] == etag
+        assert HabitFeedCache(client=self.redis).get_stats() == {"hits": 0, "misses": 1}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.habit.place = "Парк"
+            self.habit.save()
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response["ETag"] != etag
+
+    def test_private_change_invalidates_only_owner(self, django_capture_on_commit_callbacks: Any) -> None:
+        """Тестирует, что изменение приватной привычки сбрасывает только ленту владельца"""
+        self.get_feed(self.owner)
+        self.get_feed(self.reader)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.habit.action = "Бег"
+            self.habit.save()
+        owner_feed = self.get_feed(self.owner)
+        self.get_feed(self.reader)
+
+        assert "Бег" in [habit["action"] for habit in owner_feed.data["results"]]
+        assert HabitFeedCache(client=self.redis).get_stats() == {"hits": 1, "misses": 3}
+
+    def test_visibility_change_invalidates_other_readers(self, django_capture_on_commit_callbacks: Any) -> None:
+        """Тестирует, что публикация и скрытие привычки сразу видны в лентах других пользователей"""
+        assert self.get_feed(self.reader).data["count"] == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.habit.is_public = True
+            self.habit.save()
+        assert self.get_feed(self.reader).data["count"] == 2
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.habit.is_public = False
+            self.habit.save()
+        assert self.get_feed(self.reader).data["count"] == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.habit.is_public = True
+            self.habit.save()
+        assert self.get_feed(self.reader).data["count"] == 2
+        with django_capture_on_commit_callbacks(execute=True):
+            Habit.objects.filter(pk=self.habit.pk).update(is_public=False)
+        assert self.get_feed(self.reader).data["count"] == 1
+
+    def test_expanded_owners_not_cached(self) -> None:
+        """Тестирует, что страницы с развернутыми профилями владельцев строятся заново после изменения профиля"""
+        client = APIClient()
+        client.force_authenticate(user=self.reader)
+        client.get(f"{self.url}?expand=user")
+        User.objects.filter(pk=self.reader.pk).update(town="Казань")
+
+        response = client.get(f"{self.url}?expand=user")
+
+        assert response.data["results"][0]["user"]["town"] == "Казань"
+        assert HabitFeedCache(client=self.redis).get_stats() == {"hits": 0, "misses": 0}
+
+    @override_settings(HABITS_FEED_CACHE_ENABLED=False)
+    def test_cache_can_be_disabled(self) -> None:
+        """Тестирует отключение кэша настройкой"""
+        self.get_feed(self.owner)
+        self.get_feed(self.owner)
+
+        assert HabitFeedCache(client=self.redis).get_stats() == {"hits": 0, "misses": 0}
+
+
+@pytest.mark.django_db
+class TestPublicHabitFeed:
+    """Тестирование общей ленты публичных привычек"""
+
+    @pytest.fixture(autouse=True)
+    def setup_data(self, settings: Any) -> Iterator[None]:
+        """Подменяет Redis ленты, отключает кэш страниц и создает привычки нескольких пользователей"""
+        settings.HABITS_FEED_CACHE_ENABLED = False
+        self.redis = fakeredis.FakeRedis()
+        self.patcher = patch("habits.feed.get_redis_client", return_value=self.redis)
+        self.patcher.start()
+        self.reader = User.objects.create(email="public-reader@test.com")
+        self.authors = [User.objects.create(email=f"public-author{i}@test.com") for i in range(3)]
+        for i in range(12):
+            self.create_habit(self.authors[i % 3], time(6 + i % 4, 0), is_public=i % 4 != 0)
+        for i in range(4):
+            self.create_habit(self.reader, time(7 + i % 2, 0), is_public=i % 2 == 0)
+        self.feed = PublicHabitFeed(client=self.redis)
+        self.url = reverse("habits:habits-list")
+        yield
+        self.patcher.stop()
+
+    def create_habit(self, user: User, value: time, is_public: bool) -> Habit:
+        """Создает привычку пользователя"""
+        return Habit.objects.create(
+            user=user, action="Зарядка", place="Дом", time=value, duration=60, reward="Чай", is_public=is_public
+        )
+
+    def walk_feed(self, user: User) -> list[int]:
+        """Обходит ленту пользователя курсором и возвращает id привычек"""
+        client = APIClient()
+        client.force_authenticate(user=user)
+        ids: list[int] = []
+        url = f"{self.url}?cursor="
+        while url:
+            response = client.get(url)
+            ids.extend(habit["id"] for habit in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_merged_feed_matches_database(self, django_assert_num_queries: Any) -> None:
+        """Тестирует, что слияние общей ленты со своими привычками совпадает с выборкой из базы"""
+        expected = list(Habit.objects.feed_for(self.reader).order_by("time", "id").values_list("id", flat=True))
+        assert self.walk_feed(self.reader) == expected
+
+        assert self.feed.rebuild() == 11
+        client = APIClient()
+        client.force_authenticate(user=self.reader)
+        with django_assert_num_queries(1):
+            first_page = client.get(f"{self.url}?cursor=").data
+        assert self.walk_feed(self.reader) == expected
+        second_page = client.get(first_page["next"]).data
+        previous_page = client.get(second_page["previous"]).data
+        assert [habit["id"] for habit in previous_page["results"]] == expected[:5]
+
+    def test_merged_feed_sparse_fields(self) -> None:
+        """Тестирует, что fields сужает и строки общей ленты, не ломая курсор"""
+        self.feed.rebuild()
+        client = APIClient()
+        client.force_authenticate(user=self.reader)
+        page = client.get(f"{self.url}?cursor=&fields=id,action").data
+        assert all(set(habit) == {"id", "action"} for habit in page["results"])
+        assert client.get(page["next"]).status_code == 200
+
+    def test_signals_update_shared_feed(self, django_capture_on_commit_callbacks: Any) -> None:
+        """Тестирует, что публикация, изменение и удаление привычки обновляют общую ленту"""
+        self.feed.rebuild()
+        habit = self.create_habit(self.authors[0], time(5, 0), is_public=False)
+        assert self.redis.zscore(self.feed.key, habit.pk) is None
+
+        with django_capture_on_commit_callbacks(execute=True):
+            habit.is_public = True
+            habit.save()
+        assert self.walk_feed(self.reader)[0] == habit.pk
+
+        with django_capture_on_commit_callbacks(execute=True):
+            habit.time = time(23, 0)
+            habit.action = "Чтение"
+            habit.save()
+        assert self.walk_feed(self.reader)[-1] == habit.pk
+        assert json.loads(self.redis.hget(self.feed.data_key, habit.pk))["action"] == "Чтение"
+
+        habit_id = habit.pk
+        with django_capture_on_commit_callbacks(execute=True):
+            habit.delete()
+        assert habit_id not in self.walk_feed(self.reader)
+        assert self.redis.hget(self.feed.data_key, habit_id) is None
+
+    def test_queryset_hide_updates_shared_feed(self, django_capture_on_commit_callbacks: Any) -> None:
+        """Тестирует, что скрытие привычек через update() убирает их из общей ленты"""
+        self.feed.rebuild()
+        hidden_ids = set(Habit.objects.filter(user=self.authors[0], is_public=True).values_list("id", flat=True))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Habit.objects.filter(user=self.authors[0]).update(is_public=False)
+
+        assert not hidden_ids & set(self.walk_feed(self.reader))
+        assert all(self.redis.zscore(self.feed.key, habit_id) is None for habit_id in hidden_ids)
+
+
+@pytest.mark.django_db
+class TestHabitSync:
+    """Тестирование дельта-синхронизации привычек"""
+
+    @pytest.fixture(autouse=True)
+    def setup_data(self, settings: Any) -> None:
+        """Создает читателя, автора и их привычки, отключает кэш и общую ленту"""
+        settings.HABITS_FEED_CACHE_ENABLED = False
+        settings.HABITS_PUBLIC_FEED_ENABLED = False
+        settings.HABITS_SYNC_LAG_SECONDS = 0
+        self.reader = User.objects.create(email="sync-reader@test.com")
+        self.author = User.objects.create(email="sync-author@test.com")
+        self.public = self.create_habit(self.author, is_public=True)
+        self.private = self.create_habit(self.author, is_public=False)
+        self.own = self.create_habit(self.reader, is_public=False)
+        self.url = reverse("habits:habits-sync")
+
+    def create_habit(self, user: User, is_public: bool) -> Habit:
+        """Создает привычку пользователя"""
+        return Habit.objects.create(
+            user=user, action="Зарядка", place="Дом", time=time(8, 0), duration=60, reward="Чай", is_public=is_public
+        )
+
+    def sync(self, user: User, token: str = "") -> dict[str, Any]:
+        """Запрашивает изменения ленты пользователя после токена"""
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(self.url, {"since": token})
+        assert response.status_code == 200
+        return response.json()
+
+    def test_full_and_delta_sync(self) -> None:
+        """Тестирует, что после полной синхронизации возвращаются только изменения и удаления"""
+        full = self.sync(self.reader)
+        assert {habit["id"] for habit in full["changed"]} == {self.public.id, self.own.id}
+        assert full["deleted"] == [] and not full["has_more"] and not full["reset"]
+        assert self.sync(self.reader, full["token"])["changed"] == []
+
+        self.own.place = "Парк"
+        self.own.save()
+        self.private.is_public = True
+        self.private.save()
+        client = APIClient()
+        client.force_authenticate(user=self.author)
+        client.delete(reverse("habits:habit-delete", args=(self.public.id,)))
+        delta = self.sync(self.reader, full["token"])
+        assert [habit["id"] for habit in delta["changed"]] == [self.own.id, self.private.id]
+        assert delta["changed"][0]["place"] == "Парк"
+        assert delta["deleted"] == [self.public.id]
+
+    def test_visibility_changes(self) -> None:
+        """Тестирует, что скрытие публичной привычки удаляет ее у других пользователей, но не у владельца"""
+        reader_token = self.sync(self.reader)["token"]
+        author_token = self.sync(self.author)["token"]
+        self.public.is_public = False
+        self.public.save()
+        assert self.sync(self.reader, reader_token)["deleted"] == [self.public.id]
+        author_delta = self.sync(self.author, author_token)
+        assert [habit["id"] for habit in author_delta["changed"]] == [self.public.id]
+        assert author_delta["deleted"] == []
+
+        self.public.is_public = True
+        self.public.save()
+        delta = self.sync(self.reader, reader_token)
+        assert [habit["id"] for habit in delta["changed"]] == [self.public.id]
+        assert delta["deleted"] == []
+
+        token = self.sync(self.reader)["token"]
+        Habit.objects.filter(user=self.author).update(is_public=False)
+        assert self.sync(self.reader, token)["deleted"] == [self.public.id]
+
+    def test_paging_and_reset(self) -> None:
+        """Тестирует обход изменений страницами и полную синхронизацию по устаревшему токену"""
+        with override_settings(HABITS_SYNC_PAGE_SIZE=1):
+            ids, token, has_more = [], "", True
+            while has_more:
+                page = self.sync(self.reader, token)
+                ids.extend(habit["id"] for habit in page["changed"])
+                token, has_more = page["token"], page["has_more"]
+        assert ids == [self.public.id, self.own.id]
+
+        stale = encode_sync_token((timezone.now() - timedelta(days=31), SYNC_HABIT, 0))
+        assert self.sync(self.reader, stale)["reset"]
+        client = APIClient()
+        client.force_authenticate(user=self.reader)
+        assert client.get(self.url, {"since": "not-a-token"}).status_code == 400
+
+    @override_settings(HABITS_SYNC_PAGE_SIZE=1, HABITS_SYNC_LAG_SECONDS=60)
+    def test_lag_rewinds_every_page(self) -> None:
+        """Тестирует, что токен неполной страницы не пропускает изменения, закоммиченные задним числом"""
+        page = self.sync(self.reader)
+        assert [habit["id"] for habit in page["changed"]] == [self.public.id]
+        assert not page["has_more"]
+
+        late = self.create_habit(self.author, is_public=True)
+        Habit.objects.filter(pk=late.pk).update(updated_at=self.public.updated_at - timedelta(seconds=1))
+        assert [habit["id"] for habit in self.sync(self.reader, page["token"])["changed"]] == [late.id]
+
+
+@pytest.mark.django_db
+class TestHabitBulk:
+    """Тестирование массовых операций с привычками"""
+
+    @pytest.fixture(autouse=True)
+    def setup_data(self, settings: Any) -> None:
+        """Создает пользователя с приятной привычкой и привычку другого пользователя, отключает кэш и общую ленту"""
+        settings.HABITS_FEED_CACHE_ENABLED = False
+        settings.HABITS_PUBLIC_FEED_ENABLED = False
+        self.user = User.objects.create(email="bulk@test.com")
+        self.other = User.objects.create(email="bulk-other@test.com")
+        self.pleasant = Habit.objects.create(
+            user=self.user, action="Чай", place="Кухня", time=time(9, 0), duration=60, is_pleasant=True
+        )
+        self.foreign = Habit.objects.create(
+            user=self.other, action="Бег", place="Парк", time=time(7, 0), duration=60, reward="Душ"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("habits:habits-bulk")
+
+    def make_items(self, count: int) -> list[dict[str, Any]]:
+        """Возвращает пачку полезных привычек со связанной приятной привычкой"""
+        return [
+            {
+                "action": f"Шаг {i}",
+                "place": "Дом",
+                "time": "08:00",
+                "duration": 60,
+                "periodicity": 1,
+                "related_habit": self.pleasant.id,
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_resolves_related_in_one_query(self) -> None:
+        """Тестирует, что число запросов при создании пачки не зависит от ее размера"""
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(self.url, self.make_items(2), format="json")
+        assert response.status_code == 201
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(self.url, self.make_items(20), format="json")
+        assert response.status_code == 201
+        assert len(large) == len(small)
+        assert {habit["user"] for habit in response.json()} == {self.user.id}
+        assert Habit.objects.filter(user=self.user, related_habit=self.pleasant).count() == 22
+        assert not Habit.objects.filter(user=self.user, next_due_at__isnull=True).exists()
+
+    def test_bulk_create_reports_errors_by_index(self) -> None:
+        """Тестирует, что ошибки возвращаются по индексам элементов и пачка не создается частично"""
+        items = self.make_items(3)
+        items[1]["related_habit"] = self.foreign.id
+        items[2]["related_habit"] = 10**9
+        response = self.client.post(self.url, items, format="json")
+        assert response.status_code == 400
+        assert set(response.json()) == {"1", "2"}
+        assert "related_habit" in response.json()["2"]
+        assert Habit.objects.filter(user=self.user).count() == 1
+        with override_settings(HABITS_BULK_MAX_ITEMS=2):
+            assert self.client.post(self.url, items, format="json").status_code == 400
+
+    def test_bulk_update(self) -> None:
+        """Тестирует частичное изменение пачки поверх текущих значений и отказ для чужих привычек"""
+        self.client.post(self.url, self.make_items(2), format="json")
+        first, second = Habit.objects.filter(user=self.user, is_pleasant=False).order_by("pk")
+        first.is_public = True
+        first.save()
+        items = [{"id": first.id, "is_public": False}, {"id": self.foreign.id, "place": "Сад"}]
+        response = self.client.patch(self.url, items, format="json")
+        assert response.status_code == 400
+        assert response.json() == {"1": {"id": ["Привычка не найдена"]}}
+
+        response = self.client.patch(self.url, [{"id": second.id, "is_pleasant": True}], format="json")
+        assert response.status_code == 400
+
+        items = [{"id": first.id, "is_public": False}, {"id": second.id, "place": "Сад", "time": "10:30"}]
+        response = self.client.patch(self.url, items, format="json")
+        assert response.status_code == 200
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert not first.is_public and first.place == "Дом"
+        assert second.place == "Сад" and second.related_habit == self.pleasant
+        assert second.next_due_at.time() == time(10, 30)
+        assert HabitTombstone.objects.filter(habit_id=first.id, is_deleted=False).exists()
+
+    def test_bulk_delete(self) -> None:
+        """Тестирует удаление пачки по id и отказ без удаления, если в пачке есть чужая привычка"""
+        response = self.client.delete(self.url, [self.pleasant.id, self.foreign.id], format="json")
+        assert response.status_code == 400
+        assert response.json() == {"1": ["Привычка не найдена"]}
+        assert Habit.objects.filter(pk=self.pleasant.pk).exists()
+
+        response = self.client.delete(self.url, [self.pleasant.id], format="json")
+        assert response.status_code == 204
+        assert not Habit.objects.filter(pk=self.pleasant.pk).exists()
+        assert HabitTombstone.objects.filter(habit_id=self.pleasant.id, is_deleted=True).exists()
+
+
+@pytest.mark.django_db
+class TestRequestMetricsMiddleware:
+    """Тестирование метрик SQL-запросов и времени обработки запросов"""
+
+    @pytest.fixture(autouse=True)
+    def setup_data(self, settings: Any) -> None:
+        """Включает метрики, отключает кэш и общую ленту, создает пользователя с привычкой"""
+        settings.REQUEST_METRICS_ENABLED = True
+        settings.HABITS_FEED_CACHE_ENABLED = False
+        settings.HABITS_PUBLIC_FEED_ENABLED = False
+        self.user = User.objects.create(email="metrics@test.com")
+        Habit.objects.create(user=self.user, action="Чай", place="Кухня", time=time(9, 0), duration=60, reward="Торт")
+
+    def test_server_timing_and_log_line(self, caplog: Any) -> None:
+        """Тестирует заголовок Server-Timing и строку журнала с числом запросов и временем этапов"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with caplog.at_level("INFO", logger="crswrk_5.middleware"):
+            response = client.get(reverse("habits:habits-list"))
+        header = response["Server-Timing"]
+        assert header.startswith("db;dur=") and 'desc="2 queries"' in header
+        for name in ("serialize", "render", "total"):
+            assert f"{name};dur=" in header
+        record = json.loads(caplog.records[0].getMessage())
+        assert record["path"] == reverse("habits:habits-list")
+        assert record["queries"] == 2 and record["n_plus_one"] == {} and record["duplicate_queries"] == {}
+
+        with override_settings(REQUEST_METRICS_ENABLED=False):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            assert "Server-Timing" not in client.get(reverse("habits:habits-list"))
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0, REQUEST_METRICS_N_PLUS_ONE_THRESHOLD=3)
+    def test_flags_repeated_and_slow_queries(self, caplog: Any) -> None:
+        """Тестирует отметку дублей и N+1, а также журнал медленного запроса с SQL без параметров"""
+
+        def view(request: Any) -> HttpResponse:
+            """Выполняет один запрос дважды, запрос по привычке для каждого из трех id и запрос по email"""
+            User.objects.filter(email="secret@test.com").exists()
+            Habit.objects.filter(user=self.user).exists()
+            Habit.objects.filter(user=self.user).exists()
+            for habit_id in range(3):
+                Habit.objects.filter(pk=habit_id).first()
+            return HttpResponse()
+
+        with caplog.at_level("INFO", logger="crswrk_5.middleware"):
+            response = RequestMetricsMiddleware(view)(RequestFactory().get("/habits/list/"))
+        assert 'desc="6 queries"' in response["Server-Timing"]
+        record = json.loads(caplog.records[0].getMessage())
+        assert list(record["duplicate_queries"].values()) == [2]
+        assert list(record["n_plus_one"].values()) == [3]
+        warnings = [entry.getMessage() for entry in caplog.records if entry.levelname == "WARNING"]
+        assert len(warnings) == 2
+        assert "Медленный запрос GET /habits/list/" in warnings[1]
+        assert 'FROM "habits_habit"' in warnings[1]
+        assert "secret@test.com" not in caplog.text
+
+    def test_log_line_reaches_configured_handler(self, monkeypatch: Any, capsys: Any) -> None:
+        """Тестирует, что настройки журнала проекта выводят строку метрик только при включенных метриках"""
+        monkeypatch.delenv("REQUEST_METRICS_ENABLED", raising=False)
+        assert "crswrk_5.middleware" not in runpy.run_module("crswrk_5.settings")["LOGGING"]["loggers"]
+        monkeypatch.setenv("REQUEST_METRICS_ENABLED", "True")
+        config = runpy.run_module("crswrk_5.settings")["LOGGING"]
+
+        logger = logging.getLogger("crswrk_5.middleware")
+        handlers, level = logger.handlers[:], logger.level
+        logging.config.dictConfig(config)
+        try:
+            RequestMetricsMiddleware(lambda request: HttpResponse())(RequestFactory().get("/habits/list/"))
+        finally:
+            logger.handlers = handlers
+            logger.setLevel(level)
+        record = json.loads(capsys.readouterr().err.splitlines()[0])
+        assert record["path"] == "/habits/list/" and record["queries"] == 0
+
+
+class TestTelegramSender:
+    """Тестирование пачечной отправки сообщений через локальную заглушку телеграма"""
+
+    def test_send_batch_returns_outcomes(self) -> None:
+        """Тестирует, что пачка отправляется через пул соединений и результат приходит по каждому сообщению"""
+        with TelegramStubServer() as server:
+            sender = TelegramSender(base_url=server.url, token="token", max_workers=4)
+            results = sender.send_batch([(chat_id, f"Напоминание {chat_id}") for chat_id in range(20)])
+            sender.close()
+
+        assert [result.chat_id for result in results] == list(range(20))
+        assert all(result.ok and result.status_code == 200 for result in results)
+        assert sorted(int(message["chat_id"]) for message in server.messages) == list(range(20))
+        assert server.connections <= 4
+
+    def test_send_batch_reports_failures(self) -> None:
+        """Тестирует, что недоступность телеграма возвращается в результате, а не теряется"""
+        server = TelegramStubServer().start()
+        url = server.url
+        server.stop()
+        sender = TelegramSender(base_url=url, token="token", max_workers=2, timeout=1)
+
+        results = sender.send_batch([(1, "a"), (2, "b")])
+        sender.close()
+
+        assert [(result.chat_id, result.ok, result.status_code) for result in results] == [
+            (1, False, None),
+            (2, False, None),
+        ]
+        assert all(result.error for result in results)
+
+    def test_send_batch_reports_retry_after(self) -> None:
+        """Тестирует, что ответ 429 возвращается с retry_after из ответа телеграма"""
+        with TelegramStubServer(chat_rate=1, retry_after=3) as server:
+            sender = TelegramSender(base_url=server.url, token="token", max_workers=1)
+            results = sender.send_batch([(1, "a"), (1, "b")])
+            sender.close()
+
+        assert [(result.ok, result.status_code, result.retry_after) for result in results] == [
+            (True, 200, None),
+            (False, 429, 3.0),
+        ]
+
+    def test_rate_limited_delivery(self) -> None:
+        """Тестирует, что с общим лимитом в Redis все сообщения доставляются без ответов 429"""
+        limiter = TelegramRateLimiter(
+            client=fakeredis.FakeRedis(), global_rate=10, global_burst=5, chat_rate=5, chat_burst=1
+        )
+        messages = [(chat_id, f"Напоминание {i}") for i in range(4) for chat_id in range(5)]
+        with TelegramStubServer(global_rate=20, chat_rate=10) as server:
+            sender = TelegramSender(base_url=server.url, token="token", max_workers=8, rate_limiter=limiter)
+            results = sender.send_batch(messages)
+            sender.close()
+
+        assert all(result.ok for result in results)
+        assert len(server.messages) == len(messages)
+        assert server.rejected == 0
+
+
+class TestTelegramRateLimiter:
+    """Тестирование общего лимита отправки в телеграм"""
+
+    def setup_method(self) -> None:
+        """Создает общий для лимитеров Redis"""
+        self.client = fakeredis.FakeRedis()
+
+    def test_chat_budget(self) -> None:
+        """Тестирует лимит на один чат"""
+        limiter = TelegramRateLimiter(client=self.client, global_rate=100, global_burst=100, chat_rate=1, chat_burst=1)
+
+        assert limiter.acquire(1) == 0
+        assert 0 < limiter.acquire(1) <= 1
+        assert limiter.acquire(2) == 0
+
+    def test_global_budget_shared_between_workers(self) -> None:
+        """Тестирует, что общий лимит делится между всеми экземплярами лимитера"""
+        options = {"global_rate": 1, "global_burst": 2, "chat_rate": 10, "chat_burst": 10}
+        first = TelegramRateLimiter(client=self.client, **options)
+        second = TelegramRateLimiter(client=self.client, **options)
+
+        assert first.acquire(1) == 0
+        assert second.acquire(2) == 0
+        assert second.acquire(3) > 0
+
+
+@pytest.mark.django_db
+class TestReminderOutbox:
+    """Тестирование очереди исходящих напоминаний"""
+
+    def setup_method(self) -> None:
+        """Создает пользователя с телеграм-чатом"""
+        self.user = User.objects.create(email="outbox@test.com", tg_chat_id="123")
+
+    def create_reminders(self, count: int) -> list[ReminderOutbox]:
+        """Создает готовые к отправке напоминания"""
+        return ReminderOutbox.objects.bulk_create(
+            ReminderOutbox(chat_id=str(i), message=f"Напоминание {i}") for i in range(count)
+        )
+
+    def create_habits_due(self, *due_dates: datetime, periodicity: int = 1) -> list[Habit]:
+        """Создает привычки пользователя с указанными сроками напоминаний"""
+        return Habit.objects.bulk_create(
+            Habit(
+                action=due_at.strftime("%d %H:%M"),
+                user=self.user,
+                place="Дом",
+                time=due_at.time(),
+                next_due_at=due_at,
+                periodicity=periodicity,
+                duration=60,
+                reward="Чай",
+            )
+            for due_at in due_dates
+        )
+
+    @override_settings(REMINDERS_CHUNK_SIZE=2)
+    @patch("habits.tasks.group")
+    @patch("habits.tasks.now")
+    def test_tick_enqueues_due_reminders(self, mock_now: Mock, mock_group: Mock) -> None:
+        """Тестирует, что тик ставит в очередь по одной сводке на чат и запускает нужное число воркеров"""
+        current = timezone.now().replace(second=0, microsecond=0)
+        mock_now.return_value = current
+        self.create_habits_due(*[current] * 5, current + timedelta(hours=1))
+        for chat_id in ("456", "789"):
+            self.user = User.objects.create(email=f"outbox{chat_id}@test.com", tg_chat_id=chat_id)
+            self.create_habits_due(current)
+
+        assert send_habits_reminders() == {"habits": 7, "messages": 3, "saved_requests": 4}
+
+        digest = ReminderOutbox.objects.get(status=ReminderOutbox.Status.PENDING, chat_id="123")
+        assert digest.message.startswith("Выполните привычки:") and digest.message.count("\n") == 5
+        assert ReminderOutbox.objects.count() == 3
+        assert len(list(mock_group.call_args.args[0])) == 2
+
+    @override_settings(REMINDERS_LOOKAHEAD_MINUTES=3, REMINDERS_SPREAD_SECONDS=60)
+    @patch("habits.tasks.group")
+    @patch("habits.tasks.now")
+    def test_tick_plans_lookahead_window(self, mock_now: Mock, mock_group: Mock) -> None:
+        """Тестирует, что планировщик ставит напоминания на минуты вперед с отправкой в пределах их минуты"""
+        current = timezone.now().replace(second=0, microsecond=0)
+        mock_now.return_value = current
+        first, second = current + timedelta(minutes=1), current + timedelta(minutes=2)
+        self.create_habits_due(first, first, second, current + timedelta(minutes=5))
+
+        assert send_habits_reminders() == {"habits": 3, "messages": 2, "saved_requests": 1}
+
+        reminders = ReminderOutbox.objects.order_by("next_attempt_at")
+        assert [reminder.next_attempt_at.replace(second=0) for reminder in reminders] == [first, second]
+        assert {reminder.next_attempt_at.second for reminder in reminders} == {zlib.crc32(b"123") % 60}
+        etas = [call.kwargs["eta"] for call in mock_group.return_value.apply_async.call_args_list]
+        assert etas == [reminder.next_attempt_at for reminder in reminders]
+        assert Habit.objects.filter(next_due_at__gt=current + timedelta(days=1)).count() == 3
+
+    def test_digest_split_by_message_limit(self) -> None:
+        """Тестирует, что сводка делится на сообщения только при превышении лимита длины Telegram"""
+        habits = [(f"Действие {i}" + "x" * 80, "Дом") for i in range(100)]
+
+        messages = render_reminder_digests(habits)
+
+        assert len(messages) == 3
+        assert all(len(message) <= TELEGRAM_MESSAGE_LIMIT for message in messages)
+        assert sum(message.count("\n") for message in messages) == 100
+        assert render_reminder_digests([("Зарядка", "Дом")]) == ["Выполните привычку: Зарядка\nМесто: Дом"]
+
+    @patch("habits.tasks.group")
+    @patch("habits.tasks.now")
+    def test_tick_catches_up_missed_minutes(self, mock_now: Mock, mock_group: Mock) -> None:
+        """Тестирует, что тик отправляет все пропущенные напоминания, а повторный запуск ничего не дублирует"""
+        current = timezone.now().replace(second=0, microsecond=0)
+        mock_now.return_value = current + timedelta(seconds=10)
+        self.create_habits_due(*(current + timedelta(minutes=offset) for offset in (-3, -2, -1, 0, 1)))
+        self.create_habits_due(current - timedelta(days=2), current - timedelta(minutes=30))
+
+        assert send_habits_reminders()["habits"] == 4
+        assert send_habits_reminders()["habits"] == 0
+
+        assert ReminderOutbox.objects.count() == 1
+        assert not Habit.objects.filter(next_due_at__lte=current).exists()
+        assert ReminderWatermark.objects.filter(name=WATERMARK_NAME).exists()
+
+    @patch("habits.tasks.group")
+    @patch("habits.tasks.now")
+    def test_tick_advances_by_periodicity(self, mock_now: Mock, mock_group: Mock) -> None:
+        """Тестирует сдвиг срока напоминания на периодичность привычки"""
+        current = timezone.now().replace(second=0, microsecond=0)
+        mock_now.return_value = current
+        (habit,) = self.create_habits_due(current, periodicity=3)
+        (stale,) = self.create_habits_due(current - timedelta(days=5), periodicity=2)
+
+        send_habits_reminders()
+
+        habit.refresh_from_db()
+        stale.refresh_from_db()
+        assert habit.next_due_at == current + timedelta(days=3)
+        assert stale.next_due_at == current + timedelta(days=1)
+
+    @patch("habits.tasks.send_telegram_reminders")
+    def test_drain_marks_delivered(self, mock_send: Mock) -> None:
+        """Тестирует перевод доставленных напоминаний в статус delivered"""
+        mock_send.side_effect = lambda messages: [SendResult(chat_id, True, 200) for chat_id, _ in messages]
+        self.create_reminders(3)
+
+        assert drain_reminder_outbox() == 3
+
+        assert set(ReminderOutbox.objects.values_list("status", flat=True)) == {ReminderOutbox.Status.DELIVERED}
+        assert not ReminderOutbox.objects.filter(sent_at__isnull=True).exists()
+
+    @override_settings(REMINDERS_MAX_RETRIES=2, REMINDERS_RETRY_BACKOFF=30)
+    @patch("habits.tasks.send_telegram_reminders")
+    def test_drain_retries_with_backoff(self, mock_send: Mock) -> None:
+        """Тестирует экспоненциальную задержку повторов и перевод в failed после исчерпания попыток"""
+        mock_send.return_value = [SendResult("0", False, 500, error="boom")]
+        (reminder,) = self.create_reminders(1)
+
+        started = timezone.now()
+        drain_reminder_outbox()
+        reminder.refresh_from_db()
+        assert (reminder.status, reminder.attempts, reminder.last_error) == (ReminderOutbox.Status.PENDING, 1, "boom")
+        assert reminder.next_attempt_at >= started + timedelta(seconds=30)
+
+        ReminderOutbox.objects.filter(pk=reminder.pk).update(next_attempt_at=started)
+        drain_reminder_outbox()
+        reminder.refresh_from_db()
+        assert (reminder.status, reminder.attempts) == (ReminderOutbox.Status.FAILED, 2)
+
+    @patch("habits.tasks.send_telegram_reminders")
+    def test_drain_honours_retry_after(self, mock_send: Mock) -> None:
+        """Тестирует перенос напоминания на retry_after без учета попытки"""
+        mock_send.return_value = [SendResult("0", False, 429, retry_after=15)]
+        (reminder,) = self.create_reminders(1)
+
+        started = timezone.now()
+        drain_reminder_outbox()
+        reminder.refresh_from_db()
+
+        assert (reminder.status, reminder.attempts) == (ReminderOutbox.Status.PENDING, 0)
+        assert reminder.next_attempt_at >= started + timedelta(seconds=15)
+
+    @patch("habits.tasks.send_telegram_reminders")
+    def test_drain_fails_on_permanent_error(self, mock_send: Mock) -> None:
+        """Тестирует, что напоминание в заблокировавший бота чат сразу переводится в failed"""
+        mock_send.return_value = [SendResult("0", False, 403, error="Forbidden")]
+        (reminder,) = self.create_reminders(1)
+
+        drain_reminder_outbox()
+        reminder.refresh_from_db()
+
+        assert reminder.status == ReminderOutbox.Status.FAILED
+
+    @override_settings(REMINDERS_OUTBOX_LEASE_SECONDS=60)
+    @patch("habits.tasks.send_telegram_reminders")
+    def test_drain_leases_batch_while_sending(self, mock_send: Mock) -> None:
+        """Тестирует, что на время отправки пачка арендована и другой воркер ее не заберет"""
+
+        def send(messages: list[tuple[str, str]]) -> list[SendResult]:
+            assert drain_reminder_outbox_batch() == 0
+            assert not ReminderOutbox.objects.filter(next_attempt_at__lte=started + timedelta(seconds=60)).exists()
+            return [SendResult(chat_id, True, 200) for chat_id, _ in messages]
+
+        mock_send.side_effect = send
+        self.create_reminders(2)
+
+        started = timezone.now()
+        assert drain_reminder_outbox() == 2
+
+        assert mock_send.call_count == 1
+        assert set(ReminderOutbox.objects.values_list("status", flat=True)) == {ReminderOutbox.Status.DELIVERED}
+
+    @pytest.mark.django_db(transaction=True)
+    @patch("habits.tasks.send_telegram_reminders")
+    def test_drain_skips_locked_rows(self, mock_send: Mock) -> None:
+        """Тестирует, что воркер пропускает напоминания, заблокированные другим воркером"""
+        mock_send.side_effect = lambda messages: [SendResult(chat_id, True, 200) for chat_id, _ in messages]
+        locked, free = self.create_reminders(2)
+        is_locked, release = threading.Event(), threading.Event()
+
+        def hold_lock() -> None:
+            with transaction.atomic():
+                ReminderOutbox.objects.select_for_update().get(pk=locked.pk)
+                is_locked.set()
+                release.wait(5)
+            connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        is_locked.wait(5)
+        try:
+            assert drain_reminder_outbox() == 1
+        finally:
+            release.set()
+            thread.join()
+
+        assert ReminderOutbox.objects.get(pk=locked.pk).status == ReminderOutbox.Status.PENDING
+        assert ReminderOutbox.objects.get(pk=free.pk).status == ReminderOutbox.Status.DELIVERED
+
+
+@pytest.mark.django_db
+class TestReminderSchedule:
+    """Тестирование расписания напоминаний в Redis"""
+
+    def setup_method(self) -> None:
+        """Подменяет Redis расписания и создает пользователя с телеграм-чатом"""
+        self.client = fakeredis.FakeRedis()
+        redis_patcher = patch("habits.schedule.get_redis_client", return_value=self.client)
+        redis_patcher.start()
+        self.patchers = [redis_patcher]
+        self.schedule = ReminderSchedule()
+        self.user = User.objects.create(email="schedule@test.com", tg_chat_id="321")
+        self.current = timezone.now().replace(second=0, microsecond=0)
+
+    def teardown_method(self) -> None:
+        """Снимает подмену Redis"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def create_habit(self, due_at: datetime) -> Habit:
+        """Создает привычку с указанным сроком напоминания"""
+        (habit,) = Habit.objects.bulk_create(
+            [
+                Habit(
+                    action="Зарядка",
+                    user=self.user,
+                    place="Дом",
+                    time=due_at.time(),
+                    next_due_at=due_at,
+                    duration=60,
+                    reward="Чай",
+                )
+            ]
+        )
+        return habit
+
+    def test_pop_due_returns_only_due_in_order(self) -> None:
+        """Тестирует, что из расписания забираются только наступившие сроки и только один раз"""
+        self.schedule.batch_size = 2
+        due = [(i, self.current - timedelta(minutes=i)) for i in range(1, 5)]
+        self.schedule.add([*due, (10, self.current + timedelta(minutes=1))])
+
+        popped = self.schedule.pop_due(self.current)
+
+        assert popped == sorted(due, key=lambda item: item[1])
+        assert self.schedule.pop_due(self.current) == []
+        assert self.client.zcard(self.schedule.key) == 1
+
+    def test_load_is_incremental(self) -> None:
+        """Тестирует, что загрузчик добавляет только привычки из нового окна"""
+        near = self.create_habit(self.current + timedelta(hours=1))
+        self.create_habit(self.current + timedelta(hours=30))
+
+        assert self.schedule.load(self.current) == 1
+        far = self.create_habit(self.current + timedelta(hours=25))
+        assert self.schedule.load(self.current + timedelta(hours=2)) == 1
+
+        assert self.client.zscore(self.schedule.key, near.pk) is not None
+        assert self.client.zscore(self.schedule.key, far.pk) is not None
+
+    @override_settings(REMINDERS_SCHEDULE_BACKEND="redis")
+    def test_signals_patch_schedule(self, django_capture_on_commit_callbacks: Any) -> None:
+        """Тестирует обновление расписания при создании, изменении и удалении привычки"""
+        self.schedule.load(self.current)
+        habit = self.create_habit(self.current + timedelta(hours=1))
+        with django_capture_on_commit_callbacks(execute=True):
+            habit.save()
+        assert self.client.zscore(self.schedule.key, habit.pk) == habit.next_due_at.timestamp()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            habit.delete()
+        assert self.client.zcard(self.schedule.key) == 0
+
+    @override_settings(REMINDERS_SCHEDULE_BACKEND="redis")
+    def test_queryset_update_patches_schedule(self, django_capture_on_commit_callbacks: Any) -> None:
+        """Тестирует, что перенос времени привычки через update() обновляет ее срок в расписании"""
+        habit = self.create_habit(self.current + timedelta(hours=3))
+        self.schedule.load(self.current)
+        earlier = (self.current + timedelta(hours=1)).time()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Habit.objects.filter(pk=habit.pk).update(time=earlier)
+
+        habit.refresh_from_db()
+        assert habit.next_due_at == get_next_due_at(earlier, self.current)
+        assert self.client.zscore(self.schedule.key, habit.pk) == habit.next_due_at.timestamp()
+
+    @override_settings(REMINDERS_SCHEDULE_BACKEND="redis")
+    @patch("habits.tasks.group")
+    @patch("habits.tasks.now")
+    def test_tick_sends_scheduled_habits(self, mock_now: Mock, mock_group: Mock) -> None:
+        """Тестирует, что тик отправляет привычки из расписания и возвращает их туда с новым сроком"""
+        mock_now.return_value = self.current
+        habit = self.create_habit(self.current)
+        unscheduled = self.create_habit(self.current - timedelta(minutes=1))
+        self.schedule.load(self.current)
+        self.schedule.remove(unscheduled.pk)
+
+        assert send_habits_reminders()["messages"] == 1
+        assert send_habits_reminders()["messages"] == 0
+
+        habit.refresh_from_db()
+        assert habit.next_due_at == self.current + timedelta(days=1)
+        assert self.client.zscore(self.schedule.key, habit.pk) == habit.next_due_at.timestamp()
+        assert ReminderOutbox.objects.get().chat_id == "321"
+
+    def test_rebuild_and_verify(self) -> None:
+        """Тестирует, что сверка находит расхождения, а пересборка их устраняет"""
+        first = self.create_habit(self.current + timedelta(hours=1))
+        self.schedule.load(self.current)
+        second = self.create_habit(self.current + timedelta(hours=2))
+        self.schedule.add([(999, self.current)])
+
+        assert self.schedule.verify() == ({second.pk}, {999})
+
+        assert self.schedule.rebuild(self.current) == 2
+        assert self.schedule.verify() == (set(), set())
+        assert self.client.zscore(self.schedule.key, first.pk) is not None
@@ -1,7 +1,15 @@
 from django.urls import path
 
 from habits.apps import HabitsConfig
-from habits.views import HabitCreateView, HabitDestroyView, HabitListView, HabitRetrieveView, HabitUpdateView
+from habits.views import (
+    HabitBulkView,
+    HabitCreateView,
+    HabitDestroyView,
+    HabitListView,
+    HabitRetrieveView,
+    HabitSyncView,
+    HabitUpdateView,
+)
 
 app_name = HabitsConfig.name
 
@@ -11,4 +19,6 @@ urlpatterns = [
     path("habit/<int:pk>", HabitRetrieveView.as_view(), name="habit-retrieve"),
     path("update/<int:pk>", HabitUpdateView.as_view(), name="habit-update"),
     path("delete/<int:pk>", HabitDestroyView.as_view(), name="habit-delete"),
+    path("sync/", HabitSyncView.as_view(), name="habits-sync"),
+    path("bulk/", HabitBulkView.as_view(), name="habits-bulk"),
 ]
@@ -1,15 +1,45 @@
+import logging
+from typing import Any, Optional
+
+import redis
+from django.conf import settings
+from django.db import transaction
 from django.db.models import QuerySet
-from drf_spectacular.utils import extend_schema
-from rest_framework import permissions
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import permissions, status
 from rest_framework.generics import CreateAPIView, DestroyAPIView, UpdateAPIView
+from rest_framework.pagination import BasePagination
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 from rest_framework.viewsets import generics
 
+from crswrk_5.etags import check_if_match, get_query_key, is_not_modified, make_etag, not_modified
+from crswrk_5.serializers import EXPAND_PARAMETER, SPARSE_FIELDS_PARAMETERS, ValuesSerializer, get_expand_fields
+from habits.bulk import (
+    bulk_create_habits,
+    bulk_delete_habits,
+    bulk_update_habits,
+    check_batch,
+    get_habit_ids,
+    get_prefetched,
+)
+from habits.cache import get_cached_feed_page
+from habits.feed import PublicHabitFeed
 from habits.models import Habit
-from habits.pagination import HabitPageNumberPagination
+from habits.pagination import HabitCursorPagination, HabitPageNumberPagination
 from habits.serializers import HabitSerializer
-from users.permissions import IsOwner, IsOwnerOrPublicReadOnly
+from habits.sync import SYNC_QUERY_PARAM, encode_sync_token, get_sync_page
+from users.permissions import IsOwner, IsOwnerOrPublicReadOnly, filter_permitted
+
+logger = logging.getLogger(__name__)
+
+
+def get_habit_etag(habit_id: int, updated_at: Any, *parts: Any) -> str:
+    """Возвращает ETag привычки по ее версии, версиям развернутых связей и параметрам представления"""
+    return make_etag("habit", habit_id, updated_at, *parts)
 
 
 @extend_schema(
@@ -35,6 +65,7 @@ class HabitCreateView(CreateAPIView):
     description="Возвращает список привычек, при этом для публичного просмотра доступны только публичные привычки.",
     request=HabitSerializer,
     responses=HabitSerializer,
+    parameters=[*SPARSE_FIELDS_PARAMETERS, EXPAND_PARAMETER],
 )
 class HabitListView(generics.ListAPIView):
     """Эндпоинт просмотра списка привычек"""
@@ -43,12 +74,50 @@ class HabitListView(generics.ListAPIView):
     pagination_class = HabitPageNumberPagination
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrPublicReadOnly]
 
+    @property
+    def paginator(self) -> BasePagination:
+        """Включает курсорную пагинацию, если в запросе передан параметр cursor (пустой для первой страницы)"""
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            if request is not None and HabitCursorPagination.cursor_query_param in request.query_params:
+                self._paginator = HabitCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Отдает страницу ленты из кэша, при промахе строит ее запросом к базе"""
+        expand = get_expand_fields(request, HabitSerializer.expandable_fields)
+        # Изменение профиля не сбрасывает версии ленты, поэтому страницы с развернутыми владельцами не кэшируются
+        if "user" in expand:
+            return self.get_feed_page(request)
+        return get_cached_feed_page(request.user.pk, request, lambda: self.get_feed_page(request), not expand)
+
+    def get_feed_page(self, request: Request) -> Response:
+        """Строит страницу ленты из строк .values() и общей ленты, при expand — из объектов со связями одним запросом"""
+        paginator = self.paginator
+        expand = get_expand_fields(request, HabitSerializer.expandable_fields)
+        if expand:
+            page = self.paginate_queryset(self.get_queryset().select_related(*expand))
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        serializer = ValuesSerializer(self.get_serializer_class(), context=self.get_serializer_context())
+        if isinstance(paginator, HabitCursorPagination) and settings.HABITS_PUBLIC_FEED_ENABLED:
+            try:
+                public_feed = PublicHabitFeed()
+                if public_feed.is_ready():
+                    own_rows = serializer.values(
+                        IsOwner().filter_queryset(request, Habit.objects.all()), *paginator.ordering
+                    )
+                    page = paginator.paginate_feed(request, own_rows, public_feed)
+                    return paginator.get_paginated_response(serializer.trim(page))
+            except redis.exceptions.RedisError as e:
+                logger.warning(f"Общая лента публичных привычек недоступна: {e}")
+        page = self.paginate_queryset(serializer.values(self.get_queryset(), *HabitCursorPagination.ordering))
+        return self.get_paginated_response(serializer.to_representation(page))
+
     def get_queryset(self) -> QuerySet:
         """Возвращает список приватных привычек пользователю, публичных для общего просмотра"""
-        user = self.request.user
-        own_habits = Habit.objects.filter(user=user)
-        public_habits = Habit.objects.filter(is_public=True).exclude(user=user)
-        return own_habits.union(public_habits).order_by("time")
+        return filter_permitted(self.request, self, Habit.objects.all()).order_by("time", "id")
 
 
 @extend_schema(
@@ -56,6 +125,7 @@ class HabitListView(generics.ListAPIView):
     description="Возвращает детальную информацию о привычке пользователю.",
     request=HabitSerializer,
     responses=HabitSerializer,
+    parameters=[*SPARSE_FIELDS_PARAMETERS, EXPAND_PARAMETER],
 )
 class HabitRetrieveView(generics.RetrieveAPIView):
     """Эндпоинт просмотра одной привычки"""
@@ -64,6 +134,44 @@ class HabitRetrieveView(generics.RetrieveAPIView):
     serializer_class = HabitSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrPublicReadOnly]
 
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Отдает привычку из строки .values() или со связями из того же запроса, по If-None-Match — 304 без тела"""
+        expand = get_expand_fields(request, HabitSerializer.expandable_fields)
+        if expand:
+            instance = get_object_or_404(self.get_queryset().select_related(*expand), pk=self.kwargs["pk"])
+            self.check_object_permissions(request, instance)
+            versions = [getattr(getattr(instance, name), "updated_at", None) for name in expand]
+            etag = get_habit_etag(instance.pk, instance.updated_at, *versions, *get_query_key(request))
+            if is_not_modified(request, etag):
+                return not_modified(etag)
+            return Response(self.get_serializer(instance).data, headers={"ETag": etag})
+        serializer = ValuesSerializer(self.get_serializer_class(), context=self.get_serializer_context())
+        row = get_object_or_404(
+            serializer.values(self.get_queryset(), "id", "user", "is_public", "updated_at"), pk=self.kwargs["pk"]
+        )
+        self.check_object_permissions(request, Habit(id=row["id"], user_id=row["user"], is_public=row["is_public"]))
+        etag = get_habit_etag(row["id"], row["updated_at"], *get_query_key(request))
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        return Response(serializer.to_representation([row])[0], headers={"ETag": etag})
+
+
+class HabitPreconditionMixin:
+    """Проверяет версию привычки из If-Match перед изменением и удалением"""
+
+    request: Request
+
+    def get_queryset(self) -> QuerySet:
+        """Блокирует строку привычки до конца запроса, если клиент передал If-Match"""
+        queryset: QuerySet = super().get_queryset()  # type: ignore[misc]
+        return queryset.select_for_update() if "If-Match" in self.request.headers else queryset
+
+    def get_object(self) -> Habit:
+        """Возвращает привычку, если ее версия совпадает с версией клиента"""
+        habit: Habit = super().get_object()  # type: ignore[misc]
+        check_if_match(self.request, get_habit_etag(habit.pk, habit.updated_at))
+        return habit
+
 
 @extend_schema(
     summary="Редактирование привычки",
@@ -71,13 +179,23 @@ class HabitRetrieveView(generics.RetrieveAPIView):
     request=HabitSerializer,
     responses=HabitSerializer,
 )
-class HabitUpdateView(UpdateAPIView):
+class HabitUpdateView(HabitPreconditionMixin, UpdateAPIView):
     """Эндпоинт редактирования привычки"""
 
     queryset = Habit.objects.all()
     serializer_class = HabitSerializer
     permission_classes = [IsOwner]
 
+    @transaction.atomic
+    def update(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Обновляет привычку в одной транзакции с проверкой If-Match"""
+        return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer: Serializer) -> None:
+        """Сохраняет привычку и отдает ее новую версию в ETag"""
+        habit = serializer.save()
+        self.headers["ETag"] = get_habit_etag(habit.pk, habit.updated_at)
+
 
 @extend_schema(
     summary="Удаление привычки",
@@ -85,9 +203,96 @@ class HabitUpdateView(UpdateAPIView):
     request=HabitSerializer,
     responses=HabitSerializer,
 )
-class HabitDestroyView(DestroyAPIView):
+class HabitDestroyView(HabitPreconditionMixin, DestroyAPIView):
     """Эндпоинт удаления привычки"""
 
     queryset = Habit.objects.all()
     serializer_class = HabitSerializer
     permission_classes = [IsOwner]
+
+    @transaction.atomic
+    def destroy(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Удаляет привычку в одной транзакции с проверкой If-Match"""
+        return super().destroy(request, *args, **kwargs)
+
+
+@extend_schema(
+    summary="Синхронизация привычек",
+    description="Возвращает привычки ленты, измененные после токена since, id удаленных и скрытых привычек "
+    "и токен для следующей синхронизации. Без since возвращает всю ленту, reset означает, что клиент должен "
+    "заменить свою копию ленты целиком.",
+    responses=HabitSerializer,
+    parameters=[
+        OpenApiParameter(SYNC_QUERY_PARAM, str, description="Токен предыдущей синхронизации"),
+        *SPARSE_FIELDS_PARAMETERS,
+    ],
+)
+class HabitSyncView(generics.GenericAPIView):
+    """Эндпоинт дельта-синхронизации привычек"""
+
+    serializer_class = HabitSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Отдает изменения ленты пользователя после токена since"""
+        serializer = ValuesSerializer(self.get_serializer_class(), context=self.get_serializer_context())
+        page = get_sync_page(
+            request.user,
+            request.query_params.get(SYNC_QUERY_PARAM),
+            lambda queryset: serializer.values(queryset, "id", "updated_at"),
+        )
+        return Response(
+            {
+                "changed": serializer.to_representation(page.changed),
+                "deleted": page.deleted,
+                "token": encode_sync_token(page.position),
+                "has_more": page.has_more,
+                "reset": page.reset,
+            }
+        )
+
+
+@extend_schema(
+    summary="Массовые операции с привычками",
+    description="Создает (POST), частично изменяет (PATCH, элементы с id) и удаляет (DELETE, список id) пачку "
+    f"привычек текущего пользователя, не больше {settings.HABITS_BULK_MAX_ITEMS} за запрос. Пачка проверяется "
+    "целиком и записывается в одной транзакции, ошибки возвращаются по индексам элементов.",
+    request=HabitSerializer(many=True),
+    responses=HabitSerializer(many=True),
+)
+class HabitBulkView(generics.GenericAPIView):
+    """Эндпоинт массового создания, изменения и удаления привычек"""
+
+    serializer_class = HabitSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+
+    def get_bulk_serializer(self, data: list[Any], instance: Optional[dict[int, Habit]] = None) -> Serializer:
+        """Возвращает сериализатор пачки, которому связанные привычки загружены заранее одним запросом"""
+        context = self.get_serializer_context()
+        context["prefetched"] = get_prefetched(self.request.user, data, (instance or {}).values())
+        return self.get_serializer(instance, data=data, many=True, context=context)
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Создает пачку привычек текущего пользователя"""
+        data = check_batch(request.data)
+        data = [{**item, "user": request.user.pk} if isinstance(item, dict) else item for item in data]
+        serializer = self.get_bulk_serializer(data)
+        serializer.is_valid(raise_exception=True)
+        habits = bulk_create_habits(serializer.validated_data)
+        return Response(self.get_serializer(habits, many=True).data, status=status.HTTP_201_CREATED)
+
+    @transaction.atomic
+    def patch(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Изменяет переданные поля пачки привычек текущего пользователя"""
+        data = check_batch(request.data)
+        habit_ids = get_habit_ids(data)
+        habits = filter_permitted(request, self, Habit.objects.all()).select_for_update().in_bulk(habit_ids)
+        serializer = self.get_bulk_serializer(data, habits)
+        serializer.is_valid(raise_exception=True)
+        updated = bulk_update_habits(habits, data, serializer.validated_data)
+        return Response(self.get_serializer(updated, many=True).data)
+
+    def delete(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Удаляет пачку привычек текущего пользователя по списку id"""
+        bulk_delete_habits(filter_permitted(request, self, Habit.objects.all()), check_batch(request.data))
+        return Response(status=status.HTTP_204_NO_CONTENT)
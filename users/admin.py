@@ -8,3 +8,5 @@ class UserAdmin(admin.ModelAdmin):
     list_display = ("email", "phone_number", "town")
     list_filter = ("town",)
     search_fields = ("email", "town")
+    # Полный COUNT(*) по таблице пользователей на каждой странице поиска слишком дорог
+    show_full_result_count = False
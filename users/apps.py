@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = "users"
+
+    def ready(self) -> None:
+        """Подключает обработчики сигналов пользователей"""
+        import users.signals  # noqa: F401
@@ -0,0 +1,43 @@
+from typing import Any
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+
+from users.cache import check_revoke_marker, get_user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация, которая берет пользователя токена из кэша, а не из базы на каждый запрос"""
+
+    def get_user(self, validated_token: Token) -> Any:
+        """Возвращает пользователя из кэша, при промахе загружает его из базы и кэширует"""
+        if not settings.USERS_AUTH_CACHE_ENABLED:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        cache = get_user_cache()
+        user = cache.get(user_id)
+        if user is None:
+            # Неактивные и удаленные пользователи не кэшируются: super() отклоняет их запросом к базе
+            user = super().get_user(validated_token)
+            cache.set(user)
+            return user
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if not check_revoke_marker(user, validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Описание схемы аутентификации в OpenAPI, такое же, как у JWTAuthentication"""
+
+    target_class = CachedJWTAuthentication
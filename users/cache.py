@@ -0,0 +1,155 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+import orjson
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from crswrk_5.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Колонки, нужные аутентификации и проверкам прав. Хеш пароля и личные данные в кэш не попадают
+CACHED_USER_FIELDS = ("id", "is_active", "is_staff", "is_superuser", "updated_at")
+
+REVOKE_MARKER_SALT = "users.cache.revoke_marker"
+
+
+def get_revoke_marker(password_hash: str) -> str:
+    """Возвращает HMAC отпечатка пароля из токена, по которому отзыв токена проверяется без хеша пароля"""
+    return salted_hmac(REVOKE_MARKER_SALT, password_hash).hexdigest()
+
+
+def check_revoke_marker(user: Any, password_hash: Optional[str]) -> bool:
+    """Проверяет, что отпечаток пароля из токена соответствует текущему паролю кэшированного пользователя"""
+    return password_hash is not None and constant_time_compare(get_revoke_marker(password_hash), user._revoke_marker)
+
+
+def dump_user(user: Any) -> bytes:
+    """Сериализует в JSON колонки пользователя, нужные аутентификации, и отметку его пароля"""
+    fields = [user._meta.get_field(name) for name in CACHED_USER_FIELDS]
+    data = {field.attname: field.get_prep_value(field.value_from_object(user)) for field in fields}
+    data["revoke_marker"] = get_revoke_marker(get_md5_hash_password(user.password))
+    return orjson.dumps(data)
+
+
+def load_user(value: bytes) -> Any:
+    """Восстанавливает пользователя из JSON как загруженного из базы с отложенными остальными колонками"""
+    model = get_user_model()
+    data = orjson.loads(value)
+    # from_db() ждет значения в порядке колонок модели
+    fields = [field for field in model._meta.concrete_fields if field.attname in CACHED_USER_FIELDS]
+    values = [field.to_python(data[field.attname]) for field in fields]
+    user = model.from_db(DEFAULT_DB_ALIAS, [field.attname for field in fields], values)
+    user._revoke_marker = data["revoke_marker"]
+    return user
+
+
+class UserCache:
+    """Кэш пользователей для аутентификации: ограниченный LRU в процессе с TTL и общий для воркеров Redis"""
+
+    def __init__(self, client: Optional[redis.Redis] = None, prefix: str = "users:auth") -> None:
+        self._client = client
+        self.prefix = prefix
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def client(self) -> redis.Redis:
+        """Возвращает клиент Redis, по умолчанию общий для процесса"""
+        return self._client or get_redis_client()
+
+    def get_key(self, user_id: Any) -> str:
+        """Возвращает ключ пользователя в Redis"""
+        return f"{self.prefix}:{user_id}"
+
+    def get(self, user_id: Any) -> Optional[Any]:
+        """Возвращает копию пользователя из процесса, а при промахе — из Redis, None, если его нет ни там, ни там"""
+        key = str(user_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                return copy.copy(entry[1])
+            self.entries.pop(key, None)
+        if not settings.USERS_AUTH_CACHE_REDIS_TTL:
+            return None
+        try:
+            value = self.client.get(self.get_key(key))
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Не удалось прочитать пользователя {key} из кэша: {e}")
+            return None
+        if value is None:
+            return None
+        user = load_user(value)
+        self.set_local(key, user)
+        return copy.copy(user)
+
+    def set(self, user: Any) -> None:
+        """Сохраняет пользователя в процессе и в Redis"""
+        key = str(user.pk)
+        # В процессе хранится тот же урезанный экземпляр, что и в Redis, поэтому попадания не зависят от уровня
+        value = dump_user(user)
+        self.set_local(key, load_user(value))
+        if not settings.USERS_AUTH_CACHE_REDIS_TTL:
+            return
+        try:
+            self.client.set(self.get_key(key), value, ex=settings.USERS_AUTH_CACHE_REDIS_TTL)
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Не удалось сохранить пользователя {key} в кэш: {e}")
+
+    def set_local(self, key: str, user: Any) -> None:
+        """Сохраняет пользователя в процессе на USERS_AUTH_CACHE_TTL секунд, вытесняя самые старые записи"""
+        with self.lock:
+            self.entries[key] = (time.monotonic() + settings.USERS_AUTH_CACHE_TTL, user)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.USERS_AUTH_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_ids: Iterable[Any]) -> None:
+        """Удаляет пользователей из кэша процесса и из Redis"""
+        keys = {str(user_id) for user_id in user_ids}
+        self.invalidate_local(keys)
+        if not keys or not settings.USERS_AUTH_CACHE_REDIS_TTL:
+            return
+        # Кэши других процессов устареют не дольше, чем на USERS_AUTH_CACHE_TTL секунд
+        try:
+            self.client.delete(*(self.get_key(key) for key in keys))
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Не удалось удалить пользователей {', '.join(sorted(keys))} из кэша: {e}")
+
+    def invalidate_local(self, user_ids: Iterable[Any]) -> None:
+        """Удаляет пользователей из кэша процесса"""
+        with self.lock:
+            for user_id in user_ids:
+                self.entries.pop(str(user_id), None)
+
+    def clear(self) -> None:
+        """Очищает кэш процесса"""
+        with self.lock:
+            self.entries.clear()
+
+
+@lru_cache(maxsize=None)
+def get_user_cache() -> UserCache:
+    """Возвращает кэш пользователей, общий для процесса"""
+    return UserCache()
+
+
+def invalidate_users(user_ids: Iterable[Any]) -> None:
+    """Сбрасывает кэш пользователей в процессе сразу, а в Redis — одним запросом после фиксации транзакции"""
+    if not settings.USERS_AUTH_CACHE_ENABLED:
+        return
+    user_ids = list(user_ids)
+    # Промах до фиксации прочитает и закэширует старую строку, поэтому удаление из Redis до нее бесполезно
+    get_user_cache().invalidate_local(user_ids)
+    transaction.on_commit(lambda: get_user_cache().invalidate(user_ids))
@@ -0,0 +1,19 @@
+from typing import Any
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+
+
+class TrigramSearchFilter(SearchFilter):
+    """Поиск по подстроке через trigram-индексы: слова короче трех символов индекс не ускоряет, они отклоняются"""
+
+    min_term_length = 3
+
+    def get_search_terms(self, request: Request) -> Any:
+        """Возвращает слова поиска, на слишком короткие отвечает 400"""
+        terms = super().get_search_terms(request)
+        if any(len(term) < self.min_term_length for term in terms):
+            message = f"Каждое слово поиска должно быть не короче {self.min_term_length} символов"
+            raise ValidationError({self.search_param: [message]})
+        return terms
@@ -0,0 +1,57 @@
+import time as timer
+from typing import Any
+
+from django.core.management import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.cache import get_user_cache
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Команда для сравнения пропускной способности воркера с кэшем пользователей при JWT-аутентификации и без него"""
+
+    help = "Замеряет запросы в секунду одного воркера при JWT-аутентификации с кэшем пользователей и без него"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Добавляет параметры замера"""
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--path", default="")
+        parser.add_argument("--redis", action="store_true", help="Замерить также чтение пользователя из Redis")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Выполняет запросы последовательно, как синхронный воркер gunicorn, и выводит req/s и запросы к базе"""
+        path = options["path"] or reverse("habits:habits-sync")
+        modes: dict[str, dict[str, Any]] = {
+            "jwt": {"USERS_AUTH_CACHE_ENABLED": False},
+            "cached, process": {"USERS_AUTH_CACHE_ENABLED": True, "USERS_AUTH_CACHE_REDIS_TTL": 0},
+        }
+        if options["redis"]:
+            modes["cached, redis"] = {"USERS_AUTH_CACHE_ENABLED": True, "USERS_AUTH_CACHE_SIZE": 0}
+        self.stdout.write(f"{'mode':>18} {'req/s':>10} {'ms/req':>10} {'queries':>8}")
+        with transaction.atomic():
+            user = User.objects.create(email="bench-auth@example.com")
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+            for name, overrides in modes.items():
+                with override_settings(**overrides):
+                    get_user_cache().clear()
+                    rate, queries = self._measure(client, path, options["requests"])
+                self.stdout.write(f"{name:>18} {rate:>10.0f} {1000 / rate:>10.3f} {queries:>8}")
+            get_user_cache().clear()
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _measure(client: Client, path: str, count: int) -> tuple[float, int]:
+        """Возвращает число запросов в секунду и число запросов к базе на прогретый запрос"""
+        client.get(path)
+        queries: list[str] = []
+        # request_started сбрасывает журнал запросов соединения, поэтому запросы считаются через обертку
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            client.get(path)
+        started = timer.perf_counter()
+        for _ in range(count):
+            client.get(path)
+        return count / (timer.perf_counter() - started), len(queries)
@@ -1,7 +1,31 @@
 from typing import Any, ClassVar, List
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as DjangoUserManager
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
+
+from users.cache import invalidate_users
+
+
+class UserQuerySet(models.QuerySet):
+    """Набор запросов пользователей, сбрасывающий кэш аутентификации при массовых изменениях"""
+
+    def update(self, **kwargs: Any) -> int:
+        """Сбрасывает кэш аутентификации изменяемых пользователей, в том числе при смене is_active через update()"""
+        if not settings.USERS_AUTH_CACHE_ENABLED:
+            return super().update(**kwargs)
+        # Кэш сбрасывается после записи, иначе промах до нее снова закэширует старую строку
+        user_ids = list(self.values_list("pk", flat=True))
+        rows = super().update(**kwargs)
+        invalidate_users(user_ids)
+        return rows
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):  # type: ignore[misc]
+    """Менеджер пользователей с набором запросов UserQuerySet"""
 
 
 class User(AbstractUser):
@@ -13,13 +37,21 @@ class User(AbstractUser):
     town = models.CharField(max_length=35, verbose_name="Город", blank=True, null=True)
     avatar = models.ImageField(upload_to="avatars/", null=True, blank=True)
     tg_chat_id = models.CharField(max_length=50, verbose_name="Телеграм chat_id", blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Время последнего изменения")
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS: ClassVar[List[str]] = []
 
+    objects = UserManager()
+
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
+        # icontains в Postgres сравнивает UPPER(колонка), поэтому trigram-индексы построены по тому же выражению
+        indexes = [
+            GinIndex(OpClass(Upper("email"), name="gin_trgm_ops"), name="users_user_email_trgm_idx"),
+            GinIndex(OpClass(Upper("town"), name="gin_trgm_ops"), name="users_user_town_trgm_idx"),
+        ]
 
     def __str__(self) -> Any:
         return self.email
@@ -1,4 +1,13 @@
+from typing import Any, Optional
+
+from django.db.models import QuerySet
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from crswrk_5.pagination import KeysetCursorPagination, get_estimated_count
+from users.models import User
 
 
 class UserPageNumberPagination(PageNumberPagination):
@@ -7,3 +16,28 @@ class UserPageNumberPagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 10
+
+
+class UserCursorPagination(KeysetCursorPagination):
+    """Курсорная пагинация каталога пользователей по id, общее число — по запросу и только оценкой планировщика"""
+
+    model = User
+    ordering = ("id",)
+    page_size = 5
+    max_page_size = 10
+    count_query_param = "count"
+    estimated_count_value = "estimated"
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: Optional[APIView] = None) -> list[Any]:
+        """Возвращает страницу каталога и, если запрошено count=estimated, оценку числа пользователей"""
+        self.count: Optional[int] = None
+        if request.query_params.get(self.count_query_param) == self.estimated_count_value:
+            self.count = get_estimated_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        """Возвращает страницу со ссылками на соседние страницы и оценкой числа пользователей, если она запрошена"""
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {"count": self.count, **response.data}
+        return response
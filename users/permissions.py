@@ -1,5 +1,6 @@
 from typing import Any
 
+from django.db.models import Q, QuerySet
 from rest_framework import permissions
 from rest_framework.views import APIView
 
@@ -8,10 +9,12 @@ class IsOwner(permissions.BasePermission):
     """Права доступа пользователей к своим привычкам"""
 
     def has_object_permission(self, request: Any, view: APIView, obj: Any) -> bool:
-        """Проверяет, является ли пользователь владельцем"""
-        if obj.user == request.user:
-            return True
-        return False
+        """Проверяет, является ли пользователь владельцем, по user_id без загрузки владельца"""
+        return obj.user_id == request.user.id
+
+    def filter_queryset(self, request: Any, queryset: QuerySet) -> QuerySet:
+        """Оставляет в выборке только объекты пользователя"""
+        return queryset.filter(user_id=request.user.id)
 
 
 class IsOwnerOrPublicReadOnly(permissions.BasePermission):
@@ -19,12 +22,18 @@ class IsOwnerOrPublicReadOnly(permissions.BasePermission):
 
     def has_object_permission(self, request: Any, view: APIView, obj: Any) -> Any:
         """Проверяет, что другие пользователи могут просматривать только публичные привычки"""
-        if obj.user == request.user:
+        if obj.user_id == request.user.id:
             return True
         if obj.is_public and request.method in permissions.SAFE_METHODS:
             return True
         return False
 
+    def filter_queryset(self, request: Any, queryset: QuerySet) -> QuerySet:
+        """Оставляет в выборке объекты пользователя, а для чтения — еще и публичные объекты других"""
+        if request.method in permissions.SAFE_METHODS:
+            return queryset.filter(Q(user_id=request.user.id) | Q(is_public=True))
+        return queryset.filter(user_id=request.user.id)
+
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """Приватные права доступа к профилю для владельца, остальные могут только просматривать"""
@@ -33,4 +42,18 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         """Разрешает редактирование профиля только владельцем"""
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj == request.user
+        return obj.pk == request.user.pk
+
+    def filter_queryset(self, request: Any, queryset: QuerySet) -> QuerySet:
+        """Оставляет для чтения все профили, для изменения — только профиль пользователя"""
+        if request.method in permissions.SAFE_METHODS:
+            return queryset
+        return queryset.filter(pk=request.user.pk)
+
+
+def filter_permitted(request: Any, view: APIView, queryset: QuerySet) -> QuerySet:
+    """Проверяет права представления в SQL: применяет к выборке фильтры всех его прав, у которых они есть"""
+    for permission in view.get_permissions():
+        if hasattr(permission, "filter_queryset"):
+            queryset = permission.filter_queryset(request, queryset)
+    return queryset
@@ -3,6 +3,7 @@ from typing import Any, Dict
 from rest_framework.fields import CharField
 from rest_framework.serializers import ModelSerializer
 
+from crswrk_5.serializers import SparseFieldsMixin
 from users.models import User
 
 
@@ -25,7 +26,7 @@ class UserCreateSerializer(ModelSerializer):
         return user
 
 
-class UserPublicSerializer(ModelSerializer):
+class UserPublicSerializer(SparseFieldsMixin, ModelSerializer):
     """Сериализатор для публичного просмотра пользователей"""
 
     class Meta:
@@ -33,12 +34,13 @@ class UserPublicSerializer(ModelSerializer):
         fields = ("id", "town", "avatar")
 
 
-class UserPrivateSerializer(ModelSerializer):
+class UserPrivateSerializer(SparseFieldsMixin, ModelSerializer):
     """Сериализатор для приватного просмотра профиля"""
 
     class Meta:
         model = User
-        exclude = ("password",)
+        # Группы и права — M2M-поля, которые добавляли бы запросы к базе в каждый ответ профиля
+        exclude = ("password", "updated_at", "groups", "user_permissions")
 
 
 class UserUpdateSerializer(ModelSerializer):
@@ -0,0 +1,19 @@
+from typing import Any
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.cache import invalidate_users
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender: Any, instance: User, **kwargs: Any) -> None:
+    """Сбрасывает кэш аутентификации пользователя после изменения профиля, пароля или активности"""
+    invalidate_users([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender: Any, instance: User, **kwargs: Any) -> None:
+    """Сбрасывает кэш аутентификации удаленного пользователя"""
+    invalidate_users([instance.pk])
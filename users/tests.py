@@ -1,9 +1,21 @@
+from typing import Any
+from unittest.mock import patch
+
+import fakeredis
+import orjson
 import pytest
+from django.db import connection
+from django.db.models import Q
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
+from users.cache import get_user_cache
 from users.models import User
+from users.serializers import UserPublicSerializer
 
 
 class UserTestCase(APITestCase):
@@ -60,6 +72,131 @@ class UserTestCase(APITestCase):
         self.assertIsNone(data["next"])
         self.assertIsNone(data["previous"])
 
+    def test_user_list_matches_serializer(self) -> None:
+        """Тестирует, что список из строк .values() совпадает с выводом UserPublicSerializer, включая аватар"""
+        self.user.town = "Казань"
+        self.user.avatar = "avatars/test.png"
+        self.user.save()
+        response = self.client.get(reverse("users:users-list"))
+        request = response.wsgi_request
+        expected = UserPublicSerializer(self.user, context={"request": request}).data
+        self.assertEqual(response.json()["results"], [dict(expected)])
+
+    def test_user_sparse_fields(self) -> None:
+        """Тестирует, что fields сужает профиль и выборку из базы, а неизвестные поля отклоняются"""
+        url = reverse("users:users-detail", args=(self.user.id,))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"{url}?fields=id,email")
+        self.assertEqual(response.json(), {"id": self.user.id, "email": self.user.email})
+        self.assertNotIn('"phone_number"', queries.captured_queries[0]["sql"])
+        data = self.client.get(f"{reverse('users:users-list')}?exclude=avatar").json()
+        self.assertEqual(data["results"], [{"id": self.user.id, "town": None}])
+        response = self.client.get(f"{url}?fields=password")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_query_counts(self) -> None:
+        """Тестирует число запросов к базе для списка, профиля и его изменения"""
+        User.objects.bulk_create(User(email=f"count{i}@example.com") for i in range(5))
+        with self.assertNumQueries(2):
+            self.client.get(reverse("users:users-list"))
+        url = reverse("users:users-detail", args=(self.user.id,))
+        with self.assertNumQueries(1):
+            data = self.client.get(url).json()
+        self.assertNotIn("groups", data)
+        self.assertNotIn("user_permissions", data)
+        with self.assertNumQueries(2):
+            response = self.client.patch(url, {"town": "Тверь"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_etag(self) -> None:
+        """Тестирует, что совпавший If-None-Match получает 304 за один запрос, а изменение профиля меняет ETag"""
+        url = reverse("users:users-detail", args=(self.user.id,))
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.patch(url, {"town": "Тверь"})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+@override_settings(USERS_AUTH_CACHE_REDIS_TTL=300)
+class CachedJWTAuthenticationTestCase(APITestCase):
+    """Тестирование кэша пользователей при JWT-аутентификации"""
+
+    def setUp(self) -> None:
+        """Создает пользователя, передает его токен и подменяет Redis"""
+        self.user = User.objects.create(email="cached@example.com")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.url = reverse("habits:habits-sync")
+        self.redis = fakeredis.FakeRedis()
+        redis_patcher = patch("users.cache.get_redis_client", return_value=self.redis)
+        redis_patcher.start()
+        self.addCleanup(redis_patcher.stop)
+        get_user_cache().clear()
+        self.addCleanup(get_user_cache().clear)
+
+    def count_user_queries(self) -> int:
+        """Выполняет запрос и возвращает число запросов к таблице пользователей"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sum('FROM "users_user"' in query["sql"] for query in queries.captured_queries)
+
+    def test_user_resolved_from_cache(self) -> None:
+        """Тестирует, что пользователь токена загружается из базы один раз, а затем берется из процесса и Redis"""
+        self.assertEqual(self.count_user_queries(), 1)
+        self.assertEqual(self.count_user_queries(), 0)
+        get_user_cache().clear()
+        self.assertEqual(self.count_user_queries(), 0)
+
+    def test_cache_invalidated_on_user_changes(self) -> None:
+        """Тестирует, что изменение и деактивация пользователя, в том числе через update(), сбрасывают кэш"""
+        self.count_user_queries()
+        # Из Redis пользователи удаляются после фиксации транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.town = "Казань"
+            self.user.save()
+        self.assertEqual(self.count_user_queries(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=True)
+        self.count_user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_update_invalidates_after_write(self) -> None:
+        """Тестирует, что update() сбрасывает кэш после записи, и промах не закэширует старую строку"""
+
+        def check_written(user_ids: list[int]) -> None:
+            self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+
+        with patch("users.models.invalidate_users", side_effect=check_written) as mock_invalidate:
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+        mock_invalidate.assert_called_once_with([self.user.pk])
+
+    # simplejwt пересоздает свои настройки при override_settings, а импортированные ссылки на них остаются старыми
+    @patch("rest_framework_simplejwt.tokens.api_settings.CHECK_REVOKE_TOKEN", True)
+    @patch("users.authentication.api_settings.CHECK_REVOKE_TOKEN", True)
+    def test_cached_payload_and_revoke(self) -> None:
+        """Тестирует, что в Redis нет хеша пароля и личных данных, а смена пароля отзывает токен из кэша"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.count_user_queries()
+        payload = orjson.loads(self.redis.get(get_user_cache().get_key(self.user.pk)))
+        self.assertEqual(set(payload), {"id", "is_active", "is_staff", "is_superuser", "updated_at", "revoke_marker"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("new-password-123")
+            self.user.save()
+        get_user_cache().set(User.objects.get(pk=self.user.pk))
+        get_user_cache().clear()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.assertEqual(self.count_user_queries(), 0)
+
 
 @pytest.mark.django_db
 class TestUserPagination:
@@ -117,3 +254,45 @@ class TestUserPagination:
         assert response.status_code == 200
         data = response.json()
         assert len(data["results"]) == 10  # max_page_size = 10
+
+    def test_cursor_pages(self, django_assert_num_queries: Any) -> None:
+        """Тестирует обход каталога курсорными страницами без COUNT(*) и оценку числа пользователей"""
+        ids, url = [], f"{self.url}?cursor="
+        while url:
+            with django_assert_num_queries(1):
+                data = self.client.get(url).json()
+            assert "count" not in data
+            ids.extend(user["id"] for user in data["results"])
+            url = data["next"]
+        assert ids == sorted(user.id for user in self.users)
+
+        data = self.client.get(f"{self.url}?cursor=&count=estimated&fields=town").json()
+        assert isinstance(data["count"], int)
+        assert data["results"] == [{"town": None}] * 5
+
+    def test_search(self) -> None:
+        """Тестирует поиск по подстроке email и города и отказ для слишком коротких слов"""
+        User.objects.filter(pk=self.users[3].pk).update(town="Новосибирск")
+        data = self.client.get(f"{self.url}?cursor=&search=user1").json()
+        assert [user["id"] for user in data["results"]] == [user.id for user in self.users if "user1" in user.email]
+        data = self.client.get(f"{self.url}?search=сибир").json()
+        assert [user["id"] for user in data["results"]] == [self.users[3].id]
+        assert self.client.get(f"{self.url}?search=us").status_code == 400
+
+
+@pytest.mark.django_db
+class TestUserSearchPlan:
+    """Тестирование плана запроса поиска пользователей"""
+
+    def test_search_uses_trigram_indexes(self) -> None:
+        """Тестирует, что поиск по подстроке email и города читает trigram-индексы без полного сканирования"""
+        towns = ["Москва", "Казань", "Тверь", "Омск"]
+        User.objects.bulk_create(
+            User(email=f"directory{i}@example.com", town=f"{towns[i % len(towns)]} {i}") for i in range(20_000)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE users_user")
+        plan = User.objects.filter(Q(email__icontains="ory1234") | Q(town__icontains="зань 1234")).explain()
+        assert "users_user_email_trgm_idx" in plan
+        assert "users_user_town_trgm_idx" in plan
+        assert "Seq Scan" not in plan
@@ -1,12 +1,19 @@
-from typing import List, Type
+from typing import Any, List, Type
 
-from drf_spectacular.utils import extend_schema, extend_schema_view
+from django.db.models import QuerySet
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import permissions, viewsets
+from rest_framework.pagination import BasePagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
+from crswrk_5.etags import get_query_key, is_not_modified, make_etag, not_modified
+from crswrk_5.serializers import SPARSE_FIELDS_PARAMETERS, ValuesSerializer, get_only_fields
+from users.filters import TrigramSearchFilter
 from users.models import User
-from users.pagination import UserPageNumberPagination
+from users.pagination import UserCursorPagination, UserPageNumberPagination
 from users.permissions import IsOwnerOrReadOnly
 from users.serializers import UserCreateSerializer, UserPrivateSerializer, UserPublicSerializer, UserUpdateSerializer
 
@@ -22,11 +29,21 @@ from users.serializers import UserCreateSerializer, UserPrivateSerializer, UserP
         summary="Детали пользователя",
         description="Возвращает профиль пользователя с данными о пользователе, приватные данные остаются в закрытом доступе.",
         responses=UserPrivateSerializer,
+        parameters=SPARSE_FIELDS_PARAMETERS,
     ),
     list=extend_schema(
         summary="Список пользователей",
-        description="Возвращает список всех пользователей.",
+        description="Возвращает список всех пользователей. С параметром cursor (пустым для первой страницы) список "
+        "отдается курсорными страницами по id без подсчета всех пользователей, count=estimated добавляет к ним "
+        "оценку общего числа от планировщика. Параметр search ищет по подстроке в email и городе.",
         responses=UserPublicSerializer,
+        parameters=[
+            *SPARSE_FIELDS_PARAMETERS,
+            OpenApiParameter(UserCursorPagination.cursor_query_param, str, description="Курсор каталога"),
+            OpenApiParameter(
+                UserCursorPagination.count_query_param, str, description="estimated — оценка числа пользователей"
+            ),
+        ],
     ),
     update=extend_schema(
         summary="Обновление пользователя",
@@ -51,6 +68,19 @@ class UserViewSet(viewsets.ModelViewSet):
 
     queryset = User.objects.all()
     pagination_class = UserPageNumberPagination
+    filter_backends = [TrigramSearchFilter]
+    search_fields = ("email", "town")
+
+    @property
+    def paginator(self) -> BasePagination:
+        """Включает курсорный режим каталога, если в запросе передан параметр cursor (пустой для первой страницы)"""
+        if not hasattr(self, "_paginator"):
+            request = getattr(self, "request", None)
+            if request is not None and UserCursorPagination.cursor_query_param in request.query_params:
+                self._paginator = UserCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
     def get_permissions(self) -> List[permissions.BasePermission]:
         """Получает права доступа для действий"""
@@ -65,9 +95,34 @@ class UserViewSet(viewsets.ModelViewSet):
         elif self.action in ["update", "partial_update"]:
             return UserUpdateSerializer
         elif self.action == "retrieve":
-            if self.request.user == self.get_object():
+            user = self.request.user
+            if user.is_authenticated and str(self.kwargs.get(self.lookup_field)) == str(user.pk):
                 return UserPrivateSerializer
             return UserPublicSerializer
         elif self.action == "list":
             return UserPublicSerializer
         return UserPublicSerializer
+
+    def get_queryset(self) -> QuerySet:
+        """Выбирает из базы только колонки, запрошенные для профиля параметрами fields и exclude"""
+        queryset = super().get_queryset()
+        if self.action == "retrieve":
+            queryset = queryset.only(*get_only_fields(self.get_serializer()), "updated_at")
+        return queryset
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Отдает профиль с ETag, по совпавшему If-None-Match — ответ 304 без сериализации"""
+        instance = self.get_object()
+        # last_login обновляется без updated_at, поэтому тоже входит в версию приватного профиля
+        versions = [instance.__dict__.get(name) for name in ("updated_at", "last_login")]
+        etag = make_etag("user", self.get_serializer_class().__name__, instance.pk, *versions, *get_query_key(request))
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        return Response(self.get_serializer(instance).data, headers={"ETag": etag})
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """Отдает список пользователей из строк .values() без создания экземпляров модели"""
+        serializer = ValuesSerializer(UserPublicSerializer, context=self.get_serializer_context())
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()), *UserCursorPagination.ordering)
+        page = self.paginate_queryset(queryset.order_by(*UserCursorPagination.ordering))
+        return self.get_paginated_response(serializer.to_representation(page))